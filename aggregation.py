@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+from schema import years_of
+
+
+def yoy_pct(cy, ly):
+    """YOY % change, 0 where there were no LY sales"""
+    cy = np.asarray(cy, dtype=float)
+    ly = np.asarray(ly, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(ly > 0, (cy - ly) / ly * 100, 0.0)
+
+
+def group_totals(df, keys, derived=None, firsts=(), sort=True):
+    """Sum Sales/Units_Sold by ``keys`` using 64-bit accumulators.
+
+    ``derived`` maps extra key names to arrays aligned with ``df`` (e.g. Year);
+    ``firsts`` are columns whose first value per group is kept.
+    """
+    derived = derived or {}
+    columns = {}
+    for key in keys:
+        columns[key] = derived[key] if key in derived else df[key].array
+    sums = {}
+    if 'Sales' in df.columns:
+        columns['Sales'] = df['Sales'].to_numpy(dtype=np.float64)
+        sums['Sales'] = ('Sales', 'sum')
+    if 'Units_Sold' in df.columns:
+        columns['Units_Sold'] = df['Units_Sold'].to_numpy(dtype=np.int64)
+        sums['Units_Sold'] = ('Units_Sold', 'sum')
+    for col in firsts:
+        if col in df.columns:
+            columns[col] = df[col].to_numpy()
+            sums[col] = (col, 'first')
+    frame = pd.DataFrame(columns, copy=False)
+    return frame.groupby(keys, observed=True, sort=sort).agg(**sums).reset_index()
+
+
+def build_cube(df):
+    """Aggregate sales into a (Store, Category, Year) cube with one groupby.
+
+    Category is dropped from the keys when the dataset has no Category column.
+    Rows labelled with a comparison Year (see ``alignment``) keep it; other
+    rows count towards the calendar year of their day.
+    """
+    keys = [k for k in ('Store', 'Category') if k in df.columns]
+    if 'Year' in df.columns:
+        return group_totals(df, keys + ['Year'])
+    return group_totals(df, keys + ['Year'], derived={'Year': years_of(df['Day'])})
+
+
+def cagr(first, last, periods):
+    """Compound annual growth % from ``first`` to ``last``, 0 where there were no first-year sales"""
+    first = np.asarray(first, dtype=float)
+    last = np.asarray(last, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(first > 0, (np.power(last / first, 1 / periods) - 1) * 100, 0.0)
+
+
+def _year_totals(cube, by, years, value):
+    """``by`` x Year matrix of totals for the given years, from one pivot of the cube"""
+    keys = [by] if isinstance(by, str) else list(by)
+    totals = cube.groupby(keys + ['Year'], observed=True)[value].sum().unstack('Year')
+    return totals.reindex(columns=list(years), fill_value=0).fillna(0)
+
+
+def yoy_table(cube, by, current_year, last_year, value='Sales'):
+    """CY vs LY totals and YOY % for every member of ``by`` in the cube"""
+    totals = _year_totals(cube, by, [current_year, last_year], value)
+
+    table = totals.index.to_frame(index=False)
+    table[f'{value}_CY'] = totals[current_year].to_numpy()
+    table[f'{value}_LY'] = totals[last_year].to_numpy()
+    table['YOY_%'] = yoy_pct(table[f'{value}_CY'], table[f'{value}_LY'])
+    return table
+
+
+def year_table(cube, by, years, value='Sales'):
+    """Totals for each of ``years`` side by side and CAGR % from the first to the last.
+
+    Any number of years comes out of the same single pivot.
+    """
+    years = list(years)
+    totals = _year_totals(cube, by, years, value)
+    table = totals.index.to_frame(index=False)
+    for year in years:
+        table[str(year)] = totals[year].to_numpy()
+    table['CAGR_%'] = cagr(totals[years[0]], totals[years[-1]], len(years) - 1)
+    return table
+
+
+def store_yoy(cube, current_year, last_year):
+    """Store-level YOY table as used by the Store Performance and Alerts tabs"""
+    table = yoy_table(cube, 'Store', current_year, last_year)
+    table['YOY_Positive'] = table['YOY_%'] >= 0
+    return table
+
+
+def category_yoy(cube, current_year, last_year):
+    """Category-level YOY table, including CY units when available"""
+    table = yoy_table(cube, 'Category', current_year, last_year)
+    if 'Units_Sold' in cube.columns:
+        units = cube[cube['Year'] == current_year].groupby('Category', observed=True)['Units_Sold'].sum()
+        table['Units_Sold'] = units.reindex(table['Category']).fillna(0).astype(np.int64).to_numpy()
+    return table
+
+
+def store_category_yoy(cube, current_year, last_year):
+    """YOY for every (Store, Category) pair, used for store drill-downs"""
+    return yoy_table(cube, ['Store', 'Category'], current_year, last_year)
+
+
+def store_category_pivot(cube, year, value='Sales'):
+    """Store x Category matrix for a single year"""
+    year_cube = cube[cube['Year'] == year]
+    return year_cube.pivot_table(index='Store', columns='Category', values=value,
+                                 aggfunc='sum', fill_value=0, observed=True)
+
+
+def store_locations(df):
+    """First reported coordinates for each store"""
+    return df.groupby('Store', observed=True)[['Latitude', 'Longitude']].first()
@@ -0,0 +1,136 @@
+"""Match current-year days with the last-year days they are compared against.
+
+A comparison is a table of integer day pairs built with array arithmetic;
+daily rows are then labelled with their comparison year by one merge on the
+day number, however many years are compared, instead of filtering each year
+(or store) separately. Three calendars are offered:
+
+- ``Calendar``: the same date a year earlier; 29 February has no LY day
+- ``364-day``: 52 weeks earlier, so every day meets the same weekday
+- ``Retail 4-5-4``: the same weekday of the same week of the previous NRF
+  retail year (a year ends on the Saturday nearest 31 January, and its
+  4-5-4 months are whole weeks). Week 53 of a 53-week year has no LY day,
+  and a 53-week LY is restated to start a week later.
+"""
+import numpy as np
+import pandas as pd
+
+from schema import years_of
+
+CALENDARS = ["Calendar", "364-day", "Retail 4-5-4"]
+NO_DAY = -1
+
+
+def _calendar(days):
+    """Same date a year earlier, NO_DAY for 29 February"""
+    dates = days.astype('datetime64[D]')
+    months = dates.astype('datetime64[M]')
+    ly_month = months - 12
+    ly = ly_month.astype('datetime64[D]') + (dates - months.astype('datetime64[D]'))
+    # 29 Feb rolls over into March of a non-leap year
+    valid = ly.astype('datetime64[M]') == ly_month
+    return np.where(valid, ly.astype(np.int64), NO_DAY)
+
+
+def _retail_start(years):
+    """First day of each NRF retail year: the Sunday after the Saturday nearest 31 Jan"""
+    jan31 = (np.asarray(years, dtype=np.int64) - 1970).astype('datetime64[Y]').astype('datetime64[D]').astype(np.int64) + 30
+    # 1970-01-03, day 2, was a Saturday
+    since_saturday = (jan31 - 2) % 7
+    saturday = np.where(since_saturday <= 3, jan31 - since_saturday, jan31 + 7 - since_saturday)
+    return saturday + 1
+
+
+def _retail_454(days):
+    """Same day of the same retail week a retail year earlier, NO_DAY for week 53"""
+    years = years_of(days)
+    start = _retail_start(years)
+    # January days before the Sunday belong to the previous retail year
+    before = days < start
+    years = years - before
+    start = np.where(before, _retail_start(years), start)
+    # A 53-week LY is restated without its first week, as NRF does, so
+    # that Christmas still meets Christmas the year after
+    ly_start = _retail_start(years - 1)
+    ly = ly_start + (start - ly_start - 364) + (days - start)
+    return np.where(days - start < 364, ly, NO_DAY)
+
+
+def ly_days(days, calendar="Calendar"):
+    """LY day number matched to each CY day number, NO_DAY where there is none"""
+    days = np.asarray(days, dtype=np.int64)
+    if calendar == "Calendar":
+        return _calendar(days)
+    if calendar == "364-day":
+        return days - 364
+    if calendar == "Retail 4-5-4":
+        return _retail_454(days)
+    raise ValueError(f"Unknown calendar: {calendar}")
+
+
+def current_days(ranges, calendar="Calendar"):
+    """CY day numbers for a period's covered day ranges.
+
+    The current year is the last range, cut to at most a year (as
+    ``calendar`` counts it) so that it does not run into the days it is
+    compared with.
+    """
+    start, end = ranges[-1]
+    year_before = ly_days([end], calendar)[0]
+    if year_before == NO_DAY:
+        year_before = end - 366
+    return np.arange(max(start, year_before + 1), end + 1)
+
+
+def comparison(ranges, calendar="Calendar", years=2):
+    """(Day, Aligned_Day, Year) for every day in a comparison of ``years`` years.
+
+    Each CY day appears paired with itself, and each earlier year's day
+    (aligned a year at a time) paired with the CY day it is compared on;
+    Year is the comparison year the day counts towards. A day can appear
+    more than once when a long CY window reaches into the years before it.
+
+    CY days with no partner in every earlier year (29 February under
+    Calendar, retail week 53 under Retail 4-5-4) are left out, so all years
+    cover the same days.
+    """
+    if not ranges:
+        return pd.DataFrame({c: np.array([], dtype=np.int32) for c in ('Day', 'Aligned_Day', 'Year')})
+    cy = current_days(ranges, calendar)
+    current_year = int(years_of(cy[-1:])[0])
+
+    chain = [cy]
+    for _ in range(years - 1):
+        chain.append(np.where(chain[-1] != NO_DAY, ly_days(chain[-1], calendar), NO_DAY))
+    matched = np.all(np.stack(chain) != NO_DAY, axis=0)
+
+    days = [back[matched] for back in reversed(chain)]
+    aligned = [cy[matched]] * len(chain)
+    labels = [np.full(int(matched.sum()), year) for year in range(current_year - len(chain) + 1, current_year + 1)]
+    return pd.DataFrame({
+        'Day': np.concatenate(days).astype(np.int32),
+        'Aligned_Day': np.concatenate(aligned).astype(np.int32),
+        'Year': np.concatenate(labels).astype(np.int32),
+    })
+
+
+def day_ranges(days):
+    """Inclusive (start, end) ranges of consecutive day numbers"""
+    days = np.unique(np.asarray(days, dtype=np.int64))
+    if not len(days):
+        return []
+    breaks = np.flatnonzero(np.diff(days) > 1)
+    starts = np.concatenate([[0], breaks + 1])
+    ends = np.concatenate([breaks, [len(days) - 1]])
+    return [(int(days[s]), int(days[e])) for s, e in zip(starts, ends)]
+
+
+def windows(pairs):
+    """(ly_start, ly_end, cy_start, cy_end) spanned by a comparison's last two years"""
+    years = pairs['Year'].to_numpy()
+    current_year = years.max()
+    cy = pairs['Day'].to_numpy()[years == current_year]
+    ly = pairs['Day'].to_numpy()[years == current_year - 1]
+    if not len(ly):
+        ly = cy - 364
+    return int(ly.min()), int(ly.max()), int(cy.min()), int(cy.max())
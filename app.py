@@ -1,7 +1,16 @@
+import os
+
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
+
+import background
+import perf
+from file_cache import read_table
+from lazy_tabs import lazy_tabs, remember
+from stress_test import (
+    CURRENT_YEAR, HEATMAP_ORDERS, LAST_YEAR, SPIKE_THRESHOLD, action_table, clean_headers,
+    daily_yoy_heatmap, missing_columns, normalize, store_aggregates
+)
+from workbooks import DATASET_PATH, LFL_SHEET, dataset_key, read_dataset, wide
 
 # -----------------------------
 # CONFIG
@@ -12,104 +21,78 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Stage timings; ?debug=1 shows them in the sidebar
+perf.begin("app", debug=st.query_params.get("debug") == "1")
+
 st.title("Christmas YOY Execution Stress Test (2024 vs 2025)")
 st.caption("20–25 Dec | Like-to-Like Stores")
 
 # -----------------------------
 # LOAD DATA
 # -----------------------------
-@st.cache_data
-def load_data(path):
-    df = pd.read_excel(path)
+def load_data(path, progress=None):
+    if os.path.isdir(path):
+        # A dataset built by workbooks.py, back in the LFL sheet's layout
+        if progress is not None:
+            progress(None, "Reading workbook dataset...")
+        return wide(read_dataset(path, sheets=[LFL_SHEET]), LAST_YEAR, CURRENT_YEAR)
+    if progress is not None:
+        progress(None, "Parsing workbook...")
+    df = clean_headers(read_table(path))
     return df
 
-FILE_PATH = "YOY COMPARISION OF STORES & HO.xlsx"
-df_raw = load_data(FILE_PATH)
+@st.cache_resource
+def load_job(path, version=None):
+    # One background parse per process (and dataset version); every session polls the same job
+    return background.submit(load_data, path)
+
+FILE_PATH = DATASET_PATH or "YOY COMPARISION OF STORES & HO.xlsx"
+job = load_job(FILE_PATH, dataset_key(FILE_PATH) if os.path.isdir(FILE_PATH) else None)
+if not job.done():
+    # A workbook parse cannot report how far along it is: show its status, not an idle bar
+    st.status(f"{job.message} ({job.elapsed:.0f}s)", state="running")
+    perf.end()
+    background.wait()
+    st.rerun()
+
+try:
+    df_raw = job.result()
+except Exception as e:
+    load_job.clear()
+    st.error(f"Error loading {FILE_PATH}: {e}")
+    perf.end()
+    st.stop()
+# Parsed once per process on a worker thread; every run reuses it
+perf.record("load", job.elapsed, rows=len(df_raw), cached=True)
 
 # -----------------------------
 # SANITY CHECKS (FAIL FAST)
 # -----------------------------
-required_cols = [
-    "Site", "Date",
-    "Net Sale Qty - 2024", "Net Sale Amount - 2024",
-    "Net Sale Qty - 2025", "Net Sale Amount - 2025"
-]
-
-missing = [c for c in required_cols if c not in df_raw.columns]
+missing = missing_columns(df_raw)
 if missing:
     st.error(f"Missing required columns: {missing}")
+    perf.end()
     st.stop()
 
 # -----------------------------
 # NORMALIZE DATA
 # -----------------------------
-df = df_raw.rename(columns={
-    "Site": "Store",
-    "Net Sale Qty - 2024": "Qty_LY",
-    "Net Sale Amount - 2024": "Sales_LY",
-    "Net Sale Qty - 2025": "Qty_CY",
-    "Net Sale Amount - 2025": "Sales_CY"
-})
-
-df["Date"] = pd.to_datetime(df["Date"])
-
-df["Daily_YOY"] = df["Sales_CY"] - df["Sales_LY"]
-df["Qty_YOY"] = df["Qty_CY"] - df["Qty_LY"]
-
-# -----------------------------
-# AGGREGATIONS
-# -----------------------------
-store_agg = df.groupby("Store").agg(
-    Sales_LY_Total=("Sales_LY", "sum"),
-    Sales_CY_Total=("Sales_CY", "sum"),
-    Qty_LY_Total=("Qty_LY", "sum"),
-    Qty_CY_Total=("Qty_CY", "sum"),
-    Max_Daily_YOY=("Daily_YOY", "max"),
-    Min_Daily_YOY=("Daily_YOY", "min"),
-    Avg_Daily_YOY=("Daily_YOY", "mean"),
-    Std_Daily_YOY=("Daily_YOY", "std")
-).reset_index()
-
-store_agg["YOY_Delta"] = store_agg["Sales_CY_Total"] - store_agg["Sales_LY_Total"]
-store_agg["YOY_Pct"] = np.where(
-    store_agg["Sales_LY_Total"] != 0,
-    store_agg["YOY_Delta"] / store_agg["Sales_LY_Total"],
-    0
-)
-
-store_agg["Qty_YOY_Pct"] = np.where(
-    store_agg["Qty_LY_Total"] != 0,
-    (store_agg["Qty_CY_Total"] - store_agg["Qty_LY_Total"]) / store_agg["Qty_LY_Total"],
-    0
-)
-
-store_agg["YOY_Spike_Index"] = np.where(
-    store_agg["Avg_Daily_YOY"] > 0,
-    store_agg["Max_Daily_YOY"] / store_agg["Avg_Daily_YOY"],
-    np.nan
-)
-
-store_agg["YOY_Volatility"] = np.where(
-    store_agg["Avg_Daily_YOY"] != 0,
-    store_agg["Std_Daily_YOY"] / abs(store_agg["Avg_Daily_YOY"]),
-    np.nan
-)
+with perf.stage("normalize", rows=len(df_raw)):
+    df = normalize(df_raw)
 
 # -----------------------------
-# EXECUTION VERDICT (AUTO)
+# AGGREGATIONS + EXECUTION VERDICT (AUTO)
 # -----------------------------
-def verdict(row):
-    if row["YOY_Pct"] < 0:
-        return "DECLINED"
-    if row["YOY_Spike_Index"] > 1.8:
-        return "IMPROVED – FORCED"
-    if row["YOY_Pct"] > 0 and row["Qty_YOY_Pct"] >= 0:
-        return "IMPROVED – CONTROLLED"
-    if row["YOY_Pct"] > 0 and row["Qty_YOY_Pct"] < 0:
-        return "PRICE-DRIVEN RISK"
-    return "UNCLASSIFIED"
+spike_threshold = st.sidebar.number_input(
+    "YOY Spike Index threshold",
+    min_value=1.0,
+    value=SPIKE_THRESHOLD,
+    step=0.1,
+    help="Stores whose best day beats their average daily YOY by this factor are flagged as forced"
+)
 
-store_agg["Execution_Verdict"] = store_agg.apply(verdict, axis=1)
+with perf.stage("store_agg", rows=len(df)):
+    store_agg = store_aggregates(df, spike_threshold)
 
 # -----------------------------
 # KPI METRICS
@@ -120,20 +103,15 @@ net_yoy = total_cy - total_ly
 pct_improved = (store_agg["YOY_Pct"] > 0).mean() * 100
 
 # -----------------------------
-# TABS
+# TABS (only the active tab is built on a rerun)
 # -----------------------------
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
-    "CEO Verdict",
-    "Daily YOY Consistency",
-    "LY vs CY Shape",
-    "Value vs Volume",
-    "Action Table"
-])
 
 # -----------------------------
 # TAB 1 — CEO VERDICT
 # -----------------------------
-with tab1:
+def render_ceo_verdict():
+    import plotly.express as px
+
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Sales 2024", f"₹{total_ly:,.0f}")
     c2.metric("Sales 2025", f"₹{total_cy:,.0f}")
@@ -150,7 +128,7 @@ with tab1:
         title="Store-wise YOY Impact"
     )
 
-    spike_stores = store_agg[store_agg["YOY_Spike_Index"] > 1.8]
+    spike_stores = store_agg[store_agg["YOY_Spike_Index"] > spike_threshold]
     fig.add_scatter(
         x=spike_stores["YOY_Delta"],
         y=spike_stores["Store"],
@@ -159,31 +137,53 @@ with tab1:
         name="Spike-Driven"
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    perf.plotly_chart(fig, use_container_width=True)
 
 # -----------------------------
 # TAB 2 — DAILY YOY CONSISTENCY
 # -----------------------------
-with tab2:
-    heat = df.pivot_table(
-        index="Store",
-        columns=df["Date"].dt.strftime("%d-%b"),
-        values="Daily_YOY",
-        aggfunc="sum"
-    )
+HEATMAP_ROWS = 40  # stores drawn at once
+
+def render_daily_consistency():
+    import plotly.express as px
+
+    n_stores = df["Store"].nunique()
+    c1, c2, c3 = st.columns(3)
+    order = c1.selectbox("Store order", HEATMAP_ORDERS,
+                         key=remember("heat_order", HEATMAP_ORDERS[0], HEATMAP_ORDERS),
+                         help="Cluster puts stores with a similar daily pattern next to each other")
+    top, tile = None, None
+    if n_stores > HEATMAP_ROWS:
+        # Hundreds of rows make an unreadable chart and a heavy payload
+        modes = ["Top movers", "Tiles"]
+        mode = c2.radio("Stores shown", modes, horizontal=True, key=remember("heat_mode", modes[0], modes))
+        top = HEATMAP_ROWS
+        if mode == "Tiles":
+            tiles = list(range(-(-n_stores // top)))
+            tile = c3.selectbox("Tile", tiles, key=remember("heat_tile", 0, tiles),
+                                format_func=lambda t: f"Stores {t * top + 1}–{min((t + 1) * top, n_stores)}")
+        else:
+            st.caption(f"The {top} of {n_stores} stores with the largest net YOY swing")
+
+    heat = daily_yoy_heatmap(df, order=order, top=top, tile=tile)
 
     fig = px.imshow(
         heat,
         color_continuous_scale="RdYlGn",
+        color_continuous_midpoint=0,
+        aspect="auto",
         title="Daily YOY Difference (CY − LY)"
     )
-    st.plotly_chart(fig, use_container_width=True)
+    perf.plotly_chart(fig, use_container_width=True)
 
 # -----------------------------
 # TAB 3 — LY vs CY SHAPE
 # -----------------------------
-with tab3:
-    store_sel = st.selectbox("Select Store", df["Store"].unique())
+def render_shape():
+    import plotly.express as px
+
+    stores = list(df["Store"].unique())
+    store_sel = st.selectbox("Select Store", stores, key=remember("shape_store", stores[0], stores))
 
     d = df[df["Store"] == store_sel].sort_values("Date")
 
@@ -195,12 +195,14 @@ with tab3:
         title=f"LY vs CY Daily Shape — {store_sel}"
     )
     fig.update_traces(line=dict(width=3))
-    st.plotly_chart(fig, use_container_width=True)
+    perf.plotly_chart(fig, use_container_width=True)
 
 # -----------------------------
 # TAB 4 — VALUE vs VOLUME
 # -----------------------------
-with tab4:
+def render_value_volume():
+    import plotly.express as px
+
     fig = px.scatter(
         store_agg,
         x="Qty_YOY_Pct",
@@ -210,31 +212,25 @@ with tab4:
     )
     fig.add_hline(y=0)
     fig.add_vline(x=0)
-    st.plotly_chart(fig, use_container_width=True)
+    perf.plotly_chart(fig, use_container_width=True)
 
 # -----------------------------
 # TAB 5 — ACTION TABLE
 # -----------------------------
-with tab5:
-    final_table = store_agg[[
-        "Store",
-        "Sales_LY_Total",
-        "Sales_CY_Total",
-        "YOY_Delta",
-        "YOY_Pct",
-        "YOY_Spike_Index",
-        "Qty_YOY_Pct",
-        "Execution_Verdict"
-    ]]
-
-    final_table = final_table.rename(columns={
-        "Sales_LY_Total": "Sales LY",
-        "Sales_CY_Total": "Sales CY",
-        "YOY_Delta": "YOY Δ",
-        "YOY_Pct": "YOY %",
-        "YOY_Spike_Index": "YOY Spike Index",
-        "Qty_YOY_Pct": "Qty YOY %",
-        "Execution_Verdict": "Execution Verdict"
-    })
+def render_action_table():
+    final_table = action_table(store_agg)
 
     st.dataframe(final_table, use_container_width=True)
+
+
+try:
+    lazy_tabs({
+        "CEO Verdict": render_ceo_verdict,
+        "Daily YOY Consistency": render_daily_consistency,
+        "LY vs CY Shape": render_shape,
+        "Value vs Volume": render_value_volume,
+        "Action Table": render_action_table
+    }, key="active_tab")
+finally:
+    # Even when a tab fails, so its memory tracing ends with the run
+    perf.end()
@@ -0,0 +1,273 @@
+"""Embedded database storage for datasets too large to hold in memory.
+
+A ``SalesDataset`` keeps every daily row in pandas. A ``DatabaseDataset``
+keeps them in a local SQLite (or, when installed, DuckDB) file instead: the
+pipeline pushes the store, category and period filters and the YOY groupbys
+down as SQL, so only the selected comparison window or its aggregates come
+back as DataFrames. Raw rows are reduced to (Day, Store, Category) while
+they are written, so SKU-level detail never reaches the database either.
+
+Database files are named after the content hash of the upload, like the
+columnar cache, so loading the same file again reopens its database instead
+of re-ingesting it. They are read-only once built.
+"""
+import os
+import sqlite3
+import uuid
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from dataset import _daily, _prepare
+from file_cache import read_table
+from streaming import daily_chunks
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+IN_MEMORY = "In memory"
+DB_DIR = os.environ.get('SALES_DB_DIR', os.path.join('.cache', 'databases'))
+
+_COLUMN_TYPES = {
+    'Day': 'INTEGER',
+    'Store': 'TEXT',
+    'Category': 'TEXT',
+    'Sales': 'DOUBLE',
+    'Units_Sold': 'BIGINT',
+    'Latitude': 'DOUBLE',
+    'Longitude': 'DOUBLE',
+}
+_SUMS = ('Sales', 'Units_Sold')
+_FIRSTS = ('Latitude', 'Longitude')
+_LABELS = ('Store', 'Category')
+_COMPARISON = ('Year', 'Aligned_Day')
+
+
+# -----------------------------
+# ENGINES
+# -----------------------------
+class SQLiteEngine:
+    name = "SQLite"
+    suffix = '.sqlite'
+
+    def connect(self, path):
+        return sqlite3.connect(path)
+
+    def read(self, conn, sql, params=()):
+        return pd.read_sql_query(sql, conn, params=list(params))
+
+    def insert(self, conn, table, df):
+        marks = ', '.join('?' * len(df.columns))
+        conn.executemany(f"INSERT INTO {table} VALUES ({marks})", df.itertuples(index=False, name=None))
+
+    def register(self, conn, name, df):
+        """Make ``df`` queryable as a temporary table for this connection"""
+        columns = ', '.join(f"{c} INTEGER" for c in df.columns)
+        conn.execute(f"CREATE TEMP TABLE {name} ({columns})")
+        self.insert(conn, name, df.astype(np.int64))
+
+    def finish(self, conn):
+        # Period filters are day ranges; the index turns them into seeks
+        conn.execute("CREATE INDEX daily_day ON daily (Day)")
+        conn.commit()
+
+
+class DuckDBEngine:
+    name = "DuckDB"
+    suffix = '.duckdb'
+
+    def connect(self, path):
+        return duckdb.connect(path)
+
+    def read(self, conn, sql, params=()):
+        return conn.execute(sql, list(params)).df()
+
+    def insert(self, conn, table, df):
+        conn.register('chunk', df)
+        conn.execute(f"INSERT INTO {table} SELECT * FROM chunk")
+        conn.unregister('chunk')
+
+    def register(self, conn, name, df):
+        conn.register(name, df)
+
+    def finish(self, conn):
+        # Rows are written in day order, so zone maps already skip by date
+        conn.execute("CHECKPOINT")
+
+
+ENGINES = {"SQLite": SQLiteEngine()}
+if duckdb is not None:
+    ENGINES["DuckDB"] = DuckDBEngine()
+
+BACKENDS = [IN_MEMORY] + list(ENGINES)
+
+
+# -----------------------------
+# INGEST
+# -----------------------------
+def _plain(partial, columns):
+    """A daily partial with text labels, in the database's column order"""
+    partial = partial.reindex(columns=columns)
+    return partial.astype({c: str for c in _LABELS if c in columns})
+
+
+def _partials(source, name, progress=None):
+    """Daily partial aggregates of a CSV (streamed in chunks) or a workbook"""
+    if name.lower().endswith('.csv'):
+        for _, partial in daily_chunks(source, progress=progress):
+            yield partial
+        return
+    if progress is not None:
+        progress(None, "Parsing workbook...")
+    yield _daily(_prepare(read_table(source, name)))
+
+
+def ingest(source, path, engine, name=None, progress=None):
+    """Write the daily aggregate of a CSV/Excel file to a new database at ``path``.
+
+    Partials are appended to a staging table as they are read and summed to
+    one row per (Day, Store, Category), in day order, once the file is done.
+    The database is built under a temporary name and moved into place, so
+    an interrupted load never leaves a half-written file behind.
+    """
+    if name is None:
+        name = os.fspath(source) if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with closing(engine.connect(tmp_path)) as conn:
+            columns = None
+            for partial in _partials(source, name, progress):
+                if columns is None:
+                    columns = [c for c in _COLUMN_TYPES if c in partial.columns]
+                    ddl = ', '.join(f"{c} {_COLUMN_TYPES[c]}" for c in columns)
+                    conn.execute(f"CREATE TEMP TABLE staging ({ddl})")
+                engine.insert(conn, 'staging', _plain(partial, columns))
+
+            if progress is not None:
+                progress(0.9, "Building database...")
+            keys = [c for c in ('Day', 'Store', 'Category') if c in columns]
+            values = [f"SUM({c}) AS {c}" for c in _SUMS if c in columns]
+            values += [f"MIN({c}) AS {c}" for c in _FIRSTS if c in columns]
+            conn.execute(
+                f"CREATE TABLE daily AS SELECT {', '.join(keys + values)} FROM staging "
+                f"GROUP BY {', '.join(keys)} ORDER BY {', '.join(keys)}"
+            )
+            engine.finish(conn)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load(source, content_hash, backend, key, progress=None, db_dir=DB_DIR):
+    """Dataset for an uploaded file stored in ``backend``'s database, building it if needed"""
+    engine = ENGINES[backend]
+    path = os.path.join(db_dir, f"{content_hash}{engine.suffix}")
+    if not os.path.exists(path):
+        ingest(source, path, engine, progress=progress)
+    return DatabaseDataset(path, engine, key)
+
+
+# -----------------------------
+# DATASET
+# -----------------------------
+def _ranges_clause(ranges, column='d.Day'):
+    return '(' + ' OR '.join(f"{column} BETWEEN ? AND ?" for _ in ranges) + ')'
+
+
+class DatabaseDataset:
+    """A dataset whose daily table lives in an embedded database file.
+
+    Offers what the pipeline needs from a ``SalesDataset`` (key, first and
+    last day, store and category lists, the lifecycle index), plus ``rows``
+    and ``totals`` queries that filter and group in the database. Each query
+    opens its own connection, so sessions on different threads can share
+    one dataset.
+    """
+
+    def __init__(self, path, engine, key):
+        self.path = path
+        self.engine = engine
+        self.key = key
+        self.columns = list(self._query("SELECT * FROM daily LIMIT 0").columns)
+        bounds = self._query("SELECT MIN(Day) AS first_day, MAX(Day) AS last_day, COUNT(*) AS n FROM daily")
+        self.n_rows = int(bounds['n'].iloc[0])
+        self.first_day = int(bounds['first_day'].iloc[0]) if self.n_rows else None
+        self.last_day = int(bounds['last_day'].iloc[0]) if self.n_rows else None
+        self.stores = self._labels('Store')
+        self.categories = self._labels('Category') if 'Category' in self.columns else None
+        lifecycle = self._query(
+            "SELECT Store, MIN(Day) AS First_Day, MAX(Day) AS Last_Day FROM daily "
+            "WHERE Sales > 0 GROUP BY Store ORDER BY Store"
+        )
+        self.lifecycle = self._typed(lifecycle)
+
+    def _query(self, sql, params=(), pairs=None):
+        with closing(self.engine.connect(self.path)) as conn:
+            if pairs is not None:
+                self.engine.register(conn, 'pairs', pairs[['Day', 'Aligned_Day', 'Year']])
+            return self.engine.read(conn, sql, params)
+
+    def _labels(self, column):
+        return list(self._query(f"SELECT DISTINCT {column} FROM daily ORDER BY {column}")[column])
+
+    def _typed(self, df, summed=False):
+        """Query result in the dtypes the in-memory tables use"""
+        dtypes = {'Day': np.int32, 'Aligned_Day': np.int32, 'Year': np.int32,
+                  'First_Day': np.int32, 'Last_Day': np.int32,
+                  'Sales': np.float64 if summed else np.float32,
+                  'Units_Sold': np.int64 if summed else np.int32,
+                  'Latitude': np.float32, 'Longitude': np.float32}
+        df = df.astype({c: t for c, t in dtypes.items() if c in df.columns})
+        for column, labels in (('Store', self.stores), ('Category', self.categories)):
+            if column in df.columns:
+                df[column] = pd.Categorical(df[column], categories=labels)
+        return df
+
+    def _where(self, stores, categories, ranges):
+        clauses, params = [], []
+        if ranges:
+            clauses.append(_ranges_clause(ranges))
+            params += [int(day) for pair in ranges for day in pair]
+        if stores is not None:
+            clauses.append(f"d.Store IN ({', '.join('?' * len(stores))})" if stores else "FALSE")
+            params += [str(s) for s in stores]
+        if categories is not None and self.categories is not None:
+            clauses.append(f"d.Category IN ({', '.join('?' * len(categories))})" if categories else "FALSE")
+            params += [str(c) for c in categories]
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def rows(self, stores=None, categories=None, ranges=None, pairs=None):
+        """Daily rows for the selection, labelled with Year and Aligned_Day when ``pairs`` is given.
+
+        ``pairs`` is a comparison from ``alignment.comparison``; ``ranges``
+        should then be its day ranges, so the database can seek to them.
+        """
+        select = [f"d.{c}" for c in self.columns]
+        join = ''
+        if pairs is not None:
+            select += [f"p.{c}" for c in _COMPARISON]
+            join = ' JOIN pairs p ON p.Day = d.Day'
+        where, params = self._where(stores, categories, ranges)
+        sql = f"SELECT {', '.join(select)} FROM daily d{join}{where} ORDER BY d.Day"
+        return self._typed(self._query(sql, params, pairs))
+
+    def totals(self, keys, stores=None, categories=None, ranges=None, pairs=None):
+        """Sales (and Units_Sold) summed by ``keys`` in the database.
+
+        Keys may be any of the daily columns, or Year and Aligned_Day when
+        ``pairs`` is given.
+        """
+        keys = [k for k in keys if k in self.columns or (pairs is not None and k in _COMPARISON)]
+        key_columns = [f"p.{k}" if k in _COMPARISON else f"d.{k}" for k in keys]
+        sums = [f"SUM(d.{c}) AS {c}" for c in _SUMS if c in self.columns]
+        join = ' JOIN pairs p ON p.Day = d.Day' if pairs is not None else ''
+        where, params = self._where(stores, categories, ranges)
+        order = ', '.join(key_columns)
+        sql = (f"SELECT {', '.join([f'{c} AS {k}' for c, k in zip(key_columns, keys)] + sums)} "
+               f"FROM daily d{join}{where} GROUP BY {order} ORDER BY {order}")
+        return self._typed(self._query(sql, params, pairs), summed=True)
@@ -0,0 +1,61 @@
+"""Run slow loads off the script thread so the page can paint meanwhile.
+
+Streamlit reruns the whole script on every interaction. A load submitted
+here keeps running on a worker thread across reruns; the script renders
+what it already has, shows the job's progress and polls again, instead of
+blocking the first paint until the workbook is parsed.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_INTERVAL = 0.25
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='loader')
+
+
+class Job:
+    """A load running on a worker thread, with the last progress it reported.
+
+    ``fraction`` stays None for loads that cannot tell how far along they are
+    (e.g. a workbook parse); show ``message`` alone for those.
+    """
+
+    def __init__(self, func, *args):
+        self.fraction = None  # until the job reports one
+        self.message = "Loading..."
+        self.started = time.monotonic()
+        self.finished = None
+        self._future = _executor.submit(func, *args, progress=self.report)
+        self._future.add_done_callback(self._finish)
+
+    def _finish(self, future):
+        self.finished = time.monotonic()
+
+    def report(self, fraction=None, message=None):
+        """Called from the worker with a 0-1 completion fraction and/or a status message"""
+        if fraction is not None:
+            self.fraction = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    @property
+    def elapsed(self):
+        """Seconds the job has run, or ran for once finished"""
+        return (self.finished or time.monotonic()) - self.started
+
+    def done(self):
+        return self._future.done()
+
+    def result(self):
+        """The load's return value; re-raises the exception if it failed"""
+        return self._future.result()
+
+
+def submit(func, *args):
+    """Start ``func(*args, progress=callback)`` on a worker thread and return its Job"""
+    return Job(func, *args)
+
+
+def wait(interval=POLL_INTERVAL):
+    """Pause briefly before the script reruns to poll pending jobs"""
+    time.sleep(interval)
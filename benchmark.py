@@ -0,0 +1,228 @@
+"""Scaling benchmarks for every computation behind the dashboard tabs.
+
+Builds synthetic datasets over a grid of row and store counts, times each
+computation a tab runs from cold caches, and writes the timings as JSON.
+Pass a previous results file as the baseline to fail on regressions:
+
+    python benchmark.py -o benchmark.json
+    python benchmark.py --rows 10k 1M --stores 10 100 --baseline benchmark.json
+
+Results go to ``benchmark-latest.json`` by default, so a regression check
+never replaces its baseline; ``--update-baseline`` allows writing over it.
+
+Rows are sales lines spread over two years; lines for the same Date, Store
+and Category are summed when the dataset is built, as for uploaded files.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import forecasting
+import pipeline
+from aggregation import store_category_pivot, store_yoy
+from dataset import SalesDataset
+from sample_data import generate_transactions
+from schema import to_dates
+from stress_test import daily_yoy_heatmap, store_aggregates
+from verdicts import daily_yoy, store_verdicts
+
+ROWS = ["10k", "1M", "10M"]
+STORES = [10, 100, 1000]
+REPEAT = 3
+TOLERANCE = 0.25  # slowdown tolerated before a case counts as a regression
+NOISE_FLOOR = 0.01  # seconds; differences below this are timer noise
+ALERT_THRESHOLD = -10
+
+_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_count(text):
+    """Row count from text such as 10k or 1M"""
+    text = str(text).strip().lower()
+    if text and text[-1] in _SUFFIXES:
+        return int(float(text[:-1]) * _SUFFIXES[text[-1]])
+    return int(text)
+
+
+# -----------------------------
+# CASES
+# -----------------------------
+def prepare(rows, stores):
+    """Synthetic dataset and the inputs each case starts from"""
+    raw = generate_transactions(rows, n_stores=stores, rng=np.random.default_rng(0))
+    dataset = SalesDataset.from_frame(raw, key=f"benchmark-{rows}-{stores}")
+    # The whole last year against the one before: the widest comparison
+    period = (pd.Timestamp(to_dates([dataset.last_day])[0].year, 1, 1), to_dates([dataset.last_day])[0])
+    selection = pipeline.selection(None, None, period)
+
+    df = pipeline.filter_stage(dataset, *selection)
+    _, current_year, last_year = pipeline.split_stage(dataset, *selection)
+    aggregates = pipeline.aggregate_stage(dataset, *selection)
+
+    # Workbook-shaped rows, as app.py reads them: one row per store and day
+    workbook = daily_yoy(df, current_year, last_year)
+    workbook.insert(0, "Date", to_dates(workbook.pop("Day")))
+    workbook["Store"] = workbook["Store"].astype(str)
+
+    return {
+        "raw": raw,
+        "dataset": dataset,
+        "selection": selection,
+        "df": df,
+        "current_year": current_year,
+        "last_year": last_year,
+        "cube": aggregates["cube"],
+        "store_df": aggregates["store_df"],
+        "store_category_df": aggregates["store_category_df"],
+        "workbook": workbook,
+    }
+
+
+def kpi_split(ctx):
+    dataset, selection = ctx["dataset"], ctx["selection"]
+    _, current_year, last_year = pipeline.split_stage(dataset, *selection)
+    year_sales = pipeline.cube_stage(dataset, *selection).groupby("Year")["Sales"].sum()
+    return year_sales.get(current_year, 0), year_sales.get(last_year, 0)
+
+
+def alerts(ctx):
+    """The Alerts tab: stores below the threshold, their categories and the top five"""
+    store_df, store_category_df = ctx["store_df"], ctx["store_category_df"]
+    underperforming = store_df[store_df["YOY_%"] < ALERT_THRESHOLD]
+    categories = {store: store_category_df[store_category_df["Store"] == store]
+                  for store in underperforming["Store"]}
+    return categories, store_df.nlargest(5, "YOY_%")
+
+
+CASES = {
+    "load": lambda ctx: SalesDataset.from_frame(ctx["raw"], key="benchmark-load"),
+    "kpi_split": kpi_split,
+    "store_yoy": lambda ctx: store_yoy(ctx["cube"], ctx["current_year"], ctx["last_year"]),
+    "category_pivot": lambda ctx: store_category_pivot(ctx["cube"], ctx["current_year"]),
+    "weekly_rollup": lambda ctx: pipeline.rollup_stage(ctx["dataset"], *ctx["selection"], "W"),
+    "monthly_rollup": lambda ctx: pipeline.rollup_stage(ctx["dataset"], *ctx["selection"], "M"),
+    "forecast": lambda ctx: forecasting.forecast(ctx["dataset"].daily, ("Store",)),
+    "alerts": alerts,
+    "store_agg": lambda ctx: store_aggregates(ctx["workbook"]),
+    "verdicts": lambda ctx: store_verdicts(ctx["df"], ctx["current_year"], ctx["last_year"]),
+    "daily_yoy_heatmap": lambda ctx: daily_yoy_heatmap(ctx["workbook"]),
+}
+
+
+def time_case(func, ctx, repeat=REPEAT):
+    """Wall times of ``repeat`` cold runs of one case"""
+    times = []
+    for _ in range(repeat):
+        pipeline.clear_caches()
+        forecasting.clear_params()
+        start = time.perf_counter()
+        func(ctx)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run(rows_grid, stores_grid, cases, repeat=REPEAT, log=print):
+    """Timing records for every (rows, stores, case) in the grid"""
+    results = []
+    for rows in rows_grid:
+        for stores in stores_grid:
+            ctx = prepare(rows, stores)
+            daily_rows = len(ctx["dataset"].daily)
+            for name in cases:
+                times = time_case(CASES[name], ctx, repeat)
+                results.append({
+                    "rows": rows,
+                    "stores": stores,
+                    "daily_rows": daily_rows,
+                    "case": name,
+                    "seconds": min(times),
+                    "median": float(np.median(times)),
+                })
+                log(f"{rows:>10,} rows {stores:>5} stores  {name:<18} {min(times):9.4f}s")
+            del ctx
+    return results
+
+
+# -----------------------------
+# BASELINE COMPARISON
+# -----------------------------
+def compare(results, baseline, tolerance=TOLERANCE, noise_floor=NOISE_FLOOR):
+    """Cases slower than the baseline by more than ``tolerance``, as (record, baseline seconds)"""
+    previous = {(r["rows"], r["stores"], r["case"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for record in results:
+        before = previous.get((record["rows"], record["stores"], record["case"]))
+        if before is None:
+            continue
+        if record["seconds"] > before * (1 + tolerance) and record["seconds"] - before > noise_floor:
+            regressions.append((record, before))
+    return regressions
+
+
+def environment():
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the dashboard computations over synthetic datasets")
+    parser.add_argument("--rows", nargs="+", default=ROWS,
+                        help=f"Sales line counts, e.g. 10k 1M (default: {' '.join(ROWS)})")
+    parser.add_argument("--stores", nargs="+", type=int, default=STORES,
+                        help=f"Store counts (default: {' '.join(map(str, STORES))})")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), metavar="CASE",
+                        help=f"Computations to time (default: all of {', '.join(CASES)})")
+    parser.add_argument("--repeat", type=int, default=REPEAT,
+                        help=f"Runs per case; the fastest is reported (default: {REPEAT})")
+    parser.add_argument("-o", "--output", default="benchmark-latest.json",
+                        help="Results file (default: benchmark-latest.json)")
+    parser.add_argument("--baseline", help="Earlier results file to check for regressions")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Allow the results to overwrite the --baseline file")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help=f"Slowdown allowed over the baseline, as a fraction (default: {TOLERANCE})")
+    args = parser.parse_args(argv)
+    if (args.baseline and not args.update_baseline
+            and os.path.abspath(args.output) == os.path.abspath(args.baseline)):
+        parser.error("--output would overwrite --baseline; pass --update-baseline to replace it")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    rows_grid = [parse_count(r) for r in args.rows]
+    results = run(rows_grid, args.stores, args.cases, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "repeat": args.repeat, "results": results}, f, indent=2)
+    print(f"Wrote {len(results)} timings to {args.output}")
+
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for record, before in regressions:
+        print(f"REGRESSION {record['case']} at {record['rows']:,} rows / {record['stores']} stores: "
+              f"{before:.4f}s -> {record['seconds']:.4f}s", file=sys.stderr)
+    if not regressions:
+        print(f"No regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from aggregation import build_cube, group_totals
+import lifecycle
+import rollups
+from schema import normalize, concat
+
+REQUIRED_COLUMNS = ['Date', 'Store', 'Sales']
+
+
+def frame_hash(df):
+    """Content hash of a DataFrame's values"""
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.blake2b(hashes.tobytes(), digest_size=16).hexdigest()
+
+
+def derived_key(parent_key, suffix):
+    """Key for a dataset derived from ``parent_key`` (e.g. by appending a drop)"""
+    return hashlib.blake2b(f"{parent_key}:{suffix}".encode(), digest_size=16).hexdigest()
+
+
+def _key_columns(df):
+    return [k for k in ('Day', 'Store', 'Category') if k in df.columns]
+
+
+def _prepare(df):
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    return normalize(df)
+
+
+def _daily(df):
+    """Sum rows to one row per (Day, Store, Category), sorted by day"""
+    daily = group_totals(df, _key_columns(df), firsts=('Latitude', 'Longitude'))
+    daily['Sales'] = daily['Sales'].astype(np.float32)
+    if 'Units_Sold' in daily.columns:
+        daily['Units_Sold'] = daily['Units_Sold'].astype(np.int32)
+    return daily
+
+
+def _apply_delta(table, added, removed, build):
+    """Apply added/removed daily rows to an aggregate without rebuilding it.
+
+    ``build`` aggregates daily rows the same way ``table`` was built.
+    """
+    values = [c for c in table.columns if c in ('Sales', 'Units_Sold')]
+    keys = [c for c in table.columns if c not in values]
+    total = table.set_index(keys)[values]
+    if len(added):
+        total = total.add(build(added).set_index(keys)[values], fill_value=0)
+    if len(removed):
+        total = total.sub(build(removed).set_index(keys)[values], fill_value=0)
+    total = total.astype(table[values].dtypes.to_dict()).reset_index()
+    for key in keys:
+        if isinstance(table[key].dtype, pd.CategoricalDtype):
+            total[key] = total[key].astype('category')
+        elif total[key].dtype != table[key].dtype:
+            total[key] = total[key].astype(table[key].dtype)
+    return total
+
+
+class SalesDataset:
+    """Sales rows together with their aggregates and store lifecycle index.
+
+    The daily table is kept sorted by date, and ``days`` holds its day numbers,
+    so any date range maps to a contiguous block found with ``searchsorted``.
+    Weekly and monthly rollups are built once here and carried forward by
+    ``append``. Datasets are never modified in place: ``append`` returns a new
+    dataset so that frames handed out earlier stay valid.
+    """
+
+    def __init__(self, frame, daily, cube, key, weekly=None, monthly=None):
+        if not daily['Day'].is_monotonic_increasing:
+            daily = daily.sort_values('Day', kind='stable', ignore_index=True)
+        self.frame = frame
+        self.daily = daily
+        self.cube = cube
+        self.weekly = weekly if weekly is not None else rollups.build(daily, 'W')
+        self.monthly = monthly if monthly is not None else rollups.build(daily, 'M')
+        self.lifecycle = lifecycle.build(daily)
+        self.key = key
+        self.days = daily['Day'].to_numpy()
+
+    def rollup(self, freq):
+        """The weekly ('W') or monthly ('M') rollup table"""
+        return self.weekly if freq == 'W' else self.monthly
+
+    @property
+    def n_rows(self):
+        return len(self.daily)
+
+    @property
+    def stores(self):
+        return list(self.daily['Store'].cat.categories)
+
+    @property
+    def categories(self):
+        """Category names, or None when the data has no Category column"""
+        return list(self.daily['Category'].cat.categories) if 'Category' in self.daily.columns else None
+
+    @property
+    def first_day(self):
+        return int(self.days[0]) if len(self.days) else None
+
+    @property
+    def last_day(self):
+        return int(self.days[-1]) if len(self.days) else None
+
+    def day_bounds(self, start_day, end_day):
+        """Positions [lo, hi) of daily rows with start_day <= day <= end_day"""
+        lo = int(np.searchsorted(self.days, start_day, side='left'))
+        hi = int(np.searchsorted(self.days, end_day, side='right'))
+        return lo, hi
+
+    def slice_days(self, ranges):
+        """Daily rows inside the given inclusive (start_day, end_day) ranges.
+
+        A single range is returned as a positional slice of the stored table;
+        several ranges are concatenated in date order.
+        """
+        blocks = [self.day_bounds(start, end) for start, end in sorted(ranges)]
+        blocks = [(lo, hi) for lo, hi in blocks if hi > lo]
+        if len(blocks) == 1:
+            lo, hi = blocks[0]
+            return self.daily.iloc[lo:hi]
+        if not blocks:
+            return self.daily.iloc[0:0]
+        return pd.concat([self.daily.iloc[lo:hi] for lo, hi in blocks])
+
+    @classmethod
+    def from_frame(cls, df, key=None):
+        """Build a dataset and its aggregates from raw sales rows"""
+        df = _prepare(df)
+        daily = _daily(df)
+        return cls(df, daily, build_cube(daily), key or frame_hash(df))
+
+    @classmethod
+    def from_daily(cls, daily, key):
+        """Build a dataset from rows already summed to (Day, Store, Category).
+
+        The daily table doubles as the row-level frame, so nothing finer
+        grained is held in memory.
+        """
+        daily = daily.astype({'Sales': np.float32})
+        if 'Units_Sold' in daily.columns:
+            daily = daily.astype({'Units_Sold': np.int32})
+        return cls(daily, daily, build_cube(daily), key)
+
+    def append(self, new_rows, key=None):
+        """Merge a drop of new sales rows into a new dataset.
+
+        Rows are deduplicated on (Date, Store, Category): the last row in the
+        drop wins, and any existing rows for the same key are replaced.
+        Only the affected date partitions are touched and the daily, rollup
+        and cube aggregates are updated from the difference.
+        """
+        new_rows = _prepare(new_rows)
+        keys = _key_columns(self.frame)
+        missing = [k for k in keys if k not in new_rows.columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {missing}")
+        new_rows = new_rows.drop_duplicates(subset=keys, keep='last')
+        new_rows = new_rows[[c for c in self.frame.columns if c in new_rows.columns]]
+
+        new_keys = pd.MultiIndex.from_frame(new_rows[keys])
+
+        # Only rows inside the drop's date partitions can collide
+        new_days = np.unique(new_rows['Day'].to_numpy())
+        in_partition = self.frame['Day'].isin(new_days)
+        candidates = self.frame[in_partition]
+        replaced = candidates.index[pd.MultiIndex.from_frame(candidates[keys]).isin(new_keys)]
+        frame = concat([self.frame.drop(index=replaced), new_rows])
+
+        daily_in_partition = self.slice_days([(day, day) for day in new_days])
+        daily_replaced = daily_in_partition[
+            pd.MultiIndex.from_frame(daily_in_partition[keys]).isin(new_keys)
+        ]
+        daily_added = _daily(new_rows)
+        daily = concat([self.daily.drop(index=daily_replaced.index), daily_added])
+
+        cube = _apply_delta(self.cube, daily_added, daily_replaced, build_cube)
+        weekly = _apply_delta(self.weekly, daily_added, daily_replaced, lambda d: rollups.build(d, 'W'))
+        monthly = _apply_delta(self.monthly, daily_added, daily_replaced, lambda d: rollups.build(d, 'M'))
+        return SalesDataset(frame, daily, cube, key or derived_key(self.key, frame_hash(new_rows)),
+                            weekly=weekly, monthly=monthly)
@@ -0,0 +1,103 @@
+"""Server-side downsampling of long line traces before they are sent to Plotly.
+
+A chart cannot show more distinct points than it has horizontal pixels, so
+traces are capped at roughly one point per pixel of chart width. Two
+methods are available:
+
+- ``lttb`` (Largest-Triangle-Three-Buckets) keeps the points that carry the
+  most visual area, so the line keeps its shape including isolated spikes
+  such as Christmas peaks;
+- ``minmax`` keeps the lowest and highest point of every bucket, so no
+  extreme value is ever dropped.
+"""
+import numpy as np
+
+CHART_WIDTH = 1200  # px; a wide-layout chart with use_container_width
+
+
+def _last_per_bucket(values, bucket, n_buckets):
+    """Position of the largest value in each bucket (buckets numbered 0..n_buckets-1)"""
+    order = np.lexsort((values, bucket))
+    ends = np.searchsorted(bucket[order], np.arange(n_buckets), side='right') - 1
+    return order[ends]
+
+
+def lttb(x, y, n_out):
+    """Positions of the ``n_out`` points kept by Largest-Triangle-Three-Buckets.
+
+    Classic LTTB anchors each bucket's triangle on the point picked in the
+    bucket before, which forces a Python loop over buckets. Here the anchor
+    is the previous bucket's mean, as the far corner already is the next
+    bucket's mean, so every bucket is solved in one vectorised pass.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x)
+    if x.dtype.kind == 'M':
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    x = x.astype(float)
+    y = np.asarray(y, dtype=float)
+
+    # First and last points are always kept; the rest fall into n_out - 2 buckets
+    n_buckets = n_out - 2
+    inner = np.arange(1, n - 1)
+    bucket = (inner - 1) * n_buckets // (n - 2)
+    counts = np.bincount(bucket, minlength=n_buckets)
+    mean_x = np.bincount(bucket, weights=x[inner], minlength=n_buckets) / counts
+    mean_y = np.bincount(bucket, weights=y[inner], minlength=n_buckets) / counts
+
+    prev_x = np.concatenate([[x[0]], mean_x[:-1]])[bucket]
+    prev_y = np.concatenate([[y[0]], mean_y[:-1]])[bucket]
+    next_x = np.concatenate([mean_x[1:], [x[-1]]])[bucket]
+    next_y = np.concatenate([mean_y[1:], [y[-1]]])[bucket]
+
+    # Twice the area of the triangle (previous mean, candidate, next mean)
+    area = np.abs((prev_x - next_x) * (y[inner] - prev_y) - (prev_x - x[inner]) * (next_y - prev_y))
+    picks = inner[_last_per_bucket(area, bucket, n_buckets)]
+    return np.concatenate([[0], picks, [n - 1]])
+
+
+def minmax(y, n_out):
+    """Positions of the minimum and maximum of each bucket, at most ``n_out`` in all"""
+    n = len(y)
+    n_buckets = (n_out - 2) // 2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+
+    bucket = np.arange(n) * n_buckets // n
+    lows = _last_per_bucket(-y, bucket, n_buckets)
+    highs = _last_per_bucket(y, bucket, n_buckets)
+    return np.unique(np.concatenate([[0], lows, highs, [n - 1]]))
+
+
+def downsample(x, y, max_points=CHART_WIDTH, method='lttb'):
+    """Positions of the points to plot for one trace, in x order"""
+    if method == 'lttb':
+        return lttb(x, y, max_points)
+    if method == 'minmax':
+        return minmax(y, max_points)
+    raise ValueError(f"Unknown downsampling method: {method}")
+
+
+def downsample_frame(df, x, y, by=None, max_points=CHART_WIDTH, method='lttb'):
+    """Rows of ``df`` to plot, keeping at most ``max_points`` per trace.
+
+    Rows must be sorted by ``x`` within each trace; ``by`` names the column
+    that splits ``df`` into traces (e.g. Store for a line per store).
+    """
+    if by is None:
+        if len(df) <= max_points:
+            return df
+        return df.iloc[downsample(df[x].to_numpy(), df[y].to_numpy(), max_points, method)]
+
+    xs, ys = df[x].to_numpy(), df[y].to_numpy()
+    positions = []
+    for rows in df.groupby(by, observed=True, sort=False).indices.values():
+        if len(rows) > max_points:
+            rows = rows[downsample(xs[rows], ys[rows], max_points, method)]
+        positions.append(rows)
+    if not positions:
+        return df
+    return df.iloc[np.sort(np.concatenate(positions))]
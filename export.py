@@ -0,0 +1,59 @@
+"""Serialise frames for download as CSV, Excel or Parquet.
+
+Nothing here runs until an export is requested. Excel files are written with
+openpyxl's write-only mode, which streams rows to disk instead of building
+every cell object in memory, fed a bounded chunk of rows at a time.
+"""
+import io
+
+FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+_XLSX_CHUNK_ROWS = 10_000
+
+
+def _cell_rows(df, chunk_rows=_XLSX_CHUNK_ROWS):
+    """Yield rows as tuples of plain Python values, one chunk converted at a time"""
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def to_xlsx(df, sheet_name='Data'):
+    """Excel bytes for ``df``, streamed through a write-only workbook"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_name[:31])
+    sheet.append([str(c) for c in df.columns])
+    for row in _cell_rows(df):
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def to_csv(df):
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def to_parquet(df):
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def export_bytes(df, fmt, sheet_name='Data'):
+    """(data, file extension, mime type) for ``df`` in one of ``FORMATS``"""
+    extension, mime = FORMATS[fmt]
+    if fmt == 'CSV':
+        data = to_csv(df)
+    elif fmt == 'Excel':
+        data = to_xlsx(df, sheet_name)
+    else:
+        data = to_parquet(df)
+    return data, extension, mime
@@ -0,0 +1,119 @@
+import hashlib
+import io
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Converted copies live here as uncompressed Arrow IPC (Feather v2) files,
+# which are read back without any parsing or decompression.
+CACHE_DIR = os.environ.get('SALES_CACHE_DIR', os.path.join('.cache', 'columnar'))
+MAX_CACHE_BYTES = int(os.environ.get('SALES_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+_CHUNK_SIZE = 1024 * 1024
+_SUFFIX = '.feather'
+
+
+def content_hash(source):
+    """Hash the raw bytes of a path, bytes object or file-like upload"""
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    else:
+        digest.update(source.getvalue())
+    return digest.hexdigest()
+
+
+def _source_name(source, name):
+    if name is not None:
+        return name
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    return getattr(source, 'name', '')
+
+
+def _parse(source, name):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif hasattr(source, 'seek'):
+        source.seek(0)
+    if name.lower().endswith('.csv'):
+        return pd.read_csv(source)
+    return pd.read_excel(source)
+
+
+def _touch(path):
+    # mtime doubles as the LRU clock
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, keep=None):
+    """Delete least recently used entries until the cache fits in max_bytes"""
+    try:
+        entries = [e for e in os.scandir(cache_dir) if e.name.endswith(_SUFFIX)]
+    except FileNotFoundError:
+        return
+    stats = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries))
+    total = sum(size for _, size, _ in stats)
+    for _, size, path in stats:
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def read_table(source, name=None, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Read a CSV/Excel file through the content-addressed columnar cache.
+
+    The first read parses the file with pandas and stores a Feather copy keyed
+    on the file's content hash; later reads (from any session or process)
+    memory-map that copy instead of re-parsing the workbook. The columns are
+    still copied into pandas: callers rename and re-type them straight away,
+    which would copy Arrow-backed columns anyway.
+    """
+    name = _source_name(source, name)
+    kind = 'csv' if name.lower().endswith('.csv') else 'excel'
+    path = os.path.join(cache_dir, f"{content_hash(source)}-{kind}{_SUFFIX}")
+
+    if os.path.exists(path):
+        try:
+            table = feather.read_table(path, memory_map=True)
+            _touch(path)
+            return table.to_pandas()
+        except (OSError, pa.ArrowException):
+            # Truncated or corrupt entry: drop it and re-parse
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    df = _parse(source, name)
+
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+    except (OSError, ValueError, TypeError, pa.ArrowException):
+        # Columns pyarrow cannot represent (mixed object types, non-string
+        # headers) are simply served uncached
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return df
+
+    evict(cache_dir, max_bytes, keep=path)
+    return df
@@ -0,0 +1,181 @@
+"""Batch daily sales forecasts for every store (or store x category) at once.
+
+History is laid out as a dense (series x day) matrix, so each model runs as
+array operations over all series together instead of a fit per store:
+
+- ``Seasonal naive`` repeats the last week;
+- ``LY-aligned`` repeats the same weekday 364 days earlier, scaled by the
+  recent YOY growth of each series;
+- ``Holt-Winters`` is additive level + trend + weekly season, with its
+  smoothing parameters chosen per series from a small grid by one-step-ahead
+  error. Chosen parameters are cached per series and reused while only a
+  few later days have been appended; they are refitted every
+  ``REFIT_DAYS`` days of new history.
+"""
+import itertools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+HORIZON = 30
+SEASON = 7
+LY_OFFSET = 364  # same weekday last year
+FIT_WINDOW = 365  # days of history Holt-Winters is fitted on
+REFIT_DAYS = 7  # new days of history after which Holt-Winters parameters are refitted
+
+MODELS = ["Holt-Winters", "Seasonal naive", "LY-aligned"]
+
+# Holt-Winters smoothing grid: (alpha, beta, gamma)
+HW_GRID = np.array(list(itertools.product((0.1, 0.3, 0.5), (0.01, 0.1), (0.05, 0.2, 0.4))))
+
+_params_lock = threading.Lock()
+_params = OrderedDict()  # (selection, labels, first_day) -> (last_day fitted on, per-series grid index)
+_PARAMS_MAXSIZE = 32
+
+
+def series_matrix(daily, keys):
+    """(labels, first_day, Y) with Y[i, t] the sales of series i on first_day + t.
+
+    Days on which a series has no rows are zero.
+    """
+    groups = daily.groupby(list(keys), observed=True, sort=True)
+    codes = groups.ngroup().to_numpy(dtype=np.int64)
+    labels = groups.size().index.to_frame(index=False)
+    days = daily['Day'].to_numpy()
+    first_day = int(days.min())
+    n_days = int(days.max()) - first_day + 1
+    flat = codes * n_days + (days - first_day)
+    Y = np.bincount(flat, weights=daily['Sales'].to_numpy(dtype=np.float64),
+                    minlength=len(labels) * n_days).reshape(len(labels), n_days)
+    for key in keys:
+        if isinstance(daily[key].dtype, pd.CategoricalDtype):
+            labels[key] = labels[key].astype(str)
+    return labels, first_day, Y
+
+
+def seasonal_naive(Y, horizon=HORIZON):
+    """Repeat each series' last full week"""
+    last_week = Y[:, -SEASON:]
+    return last_week[:, np.arange(horizon) % SEASON]
+
+
+def ly_aligned(Y, horizon=HORIZON, window=28):
+    """Same weekday last year, scaled by growth over the last ``window`` days.
+
+    Series with less than a year of history fall back to seasonal naive;
+    ``horizon`` must not exceed 364 days.
+    """
+    T = Y.shape[1]
+    if T < LY_OFFSET + window:
+        return seasonal_naive(Y, horizon)
+    recent = Y[:, -window:].sum(axis=1)
+    year_ago = Y[:, T - LY_OFFSET - window:T - LY_OFFSET].sum(axis=1)
+    growth = np.divide(recent, year_ago, out=np.ones_like(recent), where=year_ago > 0)
+    return Y[:, T - LY_OFFSET + np.arange(horizon)] * growth[:, None]
+
+
+def _holt_winters_pass(Y, alpha, beta, gamma):
+    """Run additive Holt-Winters over Y for every row's parameters.
+
+    Returns the final (level, trend, season) state and each row's sum of
+    squared one-step-ahead errors after the two-week warm-up.
+    """
+    n, T = Y.shape
+    level = Y[:, :SEASON].mean(axis=1)
+    trend = (Y[:, SEASON:2 * SEASON].mean(axis=1) - level) / SEASON
+    season = Y[:, :SEASON] - level[:, None]
+    sse = np.zeros(n)
+
+    for t in range(T):
+        m = t % SEASON
+        y = Y[:, t]
+        s = season[:, m]
+        if t >= 2 * SEASON:
+            sse += (y - (level + trend + s)) ** 2
+        new_level = alpha * (y - s) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        season[:, m] = gamma * (y - new_level) + (1 - gamma) * s
+        level = new_level
+    return level, trend, season, sse
+
+
+def holt_winters(Y, horizon=HORIZON, choice=None):
+    """Additive Holt-Winters forecasts and the grid index chosen for each series.
+
+    ``choice`` reuses previously chosen parameters instead of searching the grid.
+    """
+    Y = Y[:, -FIT_WINDOW:]
+    n, T = Y.shape
+    if T < 2 * SEASON:
+        return seasonal_naive(Y, horizon), choice
+
+    if choice is None:
+        # Every series x every grid point in one pass
+        grid = np.repeat(HW_GRID, n, axis=0)
+        stacked = np.tile(Y, (len(HW_GRID), 1))
+        *_, sse = _holt_winters_pass(stacked, grid[:, 0], grid[:, 1], grid[:, 2])
+        choice = sse.reshape(len(HW_GRID), n).argmin(axis=0)
+
+    params = HW_GRID[choice]
+    level, trend, season, _ = _holt_winters_pass(Y, params[:, 0], params[:, 1], params[:, 2])
+    steps = np.arange(1, horizon + 1)
+    season_idx = (T + steps - 1) % SEASON
+    return level[:, None] + trend[:, None] * steps + season[:, season_idx], choice
+
+
+def _cached_choice(cache_key, last_day):
+    """Parameters fitted on the same series up to fewer than REFIT_DAYS days before ``last_day``"""
+    with _params_lock:
+        if cache_key in _params:
+            _params.move_to_end(cache_key)
+            fitted_day, choice = _params[cache_key]
+            if fitted_day <= last_day < fitted_day + REFIT_DAYS:
+                return choice
+    return None
+
+
+def _store_choice(cache_key, last_day, choice):
+    with _params_lock:
+        if cache_key in _params and _params[cache_key][1] is choice:
+            return  # reused, so keep the day it was fitted on
+        _params[cache_key] = (last_day, choice)
+        while len(_params) > _PARAMS_MAXSIZE:
+            _params.popitem(last=False)
+
+
+def clear_params():
+    """Forget every cached Holt-Winters parameter choice"""
+    with _params_lock:
+        _params.clear()
+
+
+def forecast(daily, keys=('Store',), model="Holt-Winters", horizon=HORIZON, selection=None):
+    """Daily forecasts for the ``horizon`` days after the last day in ``daily``.
+
+    ``selection`` (e.g. the store and category filter ``daily`` was cut
+    with) tells apart series that share labels, for the parameter cache.
+    Returns one row per series and future day: ``keys``, Day and Forecast.
+    """
+    keys = [k for k in keys if k in daily.columns]
+    labels, first_day, Y = series_matrix(daily, keys)
+    last_day = first_day + Y.shape[1] - 1
+
+    if model == "Seasonal naive":
+        values = seasonal_naive(Y, horizon)
+    elif model == "LY-aligned":
+        values = ly_aligned(Y, horizon)
+    elif model == "Holt-Winters":
+        cache_key = (selection, tuple(map(tuple, labels.itertuples(index=False))), first_day)
+        values, choice = holt_winters(Y, horizon, _cached_choice(cache_key, last_day))
+        if choice is not None:
+            _store_choice(cache_key, last_day, choice)
+    else:
+        raise ValueError(f"Unknown forecast model: {model}")
+
+    values = np.clip(values, 0, None)
+    out = labels.loc[labels.index.repeat(horizon)].reset_index(drop=True)
+    out['Day'] = np.tile(np.arange(last_day + 1, last_day + horizon + 1, dtype=np.int32), len(labels))
+    out['Forecast'] = values.ravel()
+    return out
@@ -0,0 +1,46 @@
+"""Tabs that only build the content of the tab being viewed.
+
+``st.tabs`` runs every tab's code on each rerun and merely hides the inactive
+ones in the browser, so a rerun pays for every tab's aggregates and figures.
+``lazy_tabs`` draws the tab bar as a horizontal radio and calls only the
+active tab's render function. Render functions import Plotly themselves, so
+the import cost is paid on the first chart drawn rather than before the
+first paint.
+"""
+import streamlit as st
+
+import perf
+
+
+def lazy_tabs(tabs, key):
+    """Draw a tab bar for ``{label: render}`` and run the active tab's ``render()``.
+
+    The active tab survives reruns in ``st.session_state[key]``. Widgets in
+    inactive tabs are not rendered, so Streamlit forgets their values; give
+    such widgets a key from ``remember`` to keep them.
+    """
+    labels = list(tabs)
+    active = st.radio("Section", labels, horizontal=True, key=key, label_visibility="collapsed")
+    with perf.stage(f"tab: {active}"):
+        tabs[active]()
+    return active
+
+
+def remember(key, default, options=None):
+    """Widget key whose value survives the widget's tab being hidden.
+
+    Streamlit drops the state of widgets that were not drawn in a run; the
+    last value seen is kept aside and restored before the widget is drawn
+    again. Values no longer in ``options`` are dropped. Pass the returned key
+    to the widget instead of a default/index.
+    """
+    saved = st.session_state.setdefault('_remembered', {})
+    value = st.session_state[key] if key in st.session_state else saved.get(key, default)
+    if options is not None:
+        if isinstance(value, list):
+            value = [v for v in value if v in options]
+        elif value not in options:
+            value = default
+    st.session_state[key] = value
+    saved[key] = value
+    return key
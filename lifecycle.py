@@ -0,0 +1,57 @@
+"""Store lifecycle index: first and last trading day of every store.
+
+Built with one groupby over the daily table when a dataset is loaded. A
+store's status for a comparison combines its first and last day with
+whether it traded (had positive sales) inside the LY and CY windows:
+
+- Like-for-like: traded in both windows and opened on or before the LY start
+- New: traded in CY but opened after the LY window started
+- Closed: traded in LY but not in CY, e.g. its last day is before the CY start
+
+Only trading inside a window counts, so a store shut on the last days of a
+window (Christmas Day, or the last day of the data) keeps its status. The
+CY window never runs past the dataset's last day.
+"""
+import numpy as np
+import pandas as pd
+
+VIEW_MODES = ["YOY – Like-to-Like Stores (LFL)", "YOY of HO", "Closed Stores", "New Stores"]
+
+
+def build(daily):
+    """(Store, First_Day, Last_Day) for every store with a day of positive sales"""
+    trading = daily[daily['Sales'].to_numpy() > 0]
+    index = trading.groupby('Store', observed=True)['Day'].agg(First_Day='min', Last_Day='max')
+    return index.reset_index()
+
+
+def status(index, windows, ly_stores, cy_stores):
+    """'LFL', 'New', 'Closed' or 'Inactive' for every store in the index.
+
+    ``windows`` is (ly_start, ly_end, cy_start, cy_end); ``ly_stores`` and
+    ``cy_stores`` are the stores with sales inside the LY and CY windows.
+    """
+    ly_start, _, cy_start, _ = windows
+    stores = index['Store'].astype(object)
+    first = index['First_Day'].to_numpy()
+    last = index['Last_Day'].to_numpy()
+    traded_ly = stores.isin(ly_stores).to_numpy()
+    traded_cy = stores.isin(cy_stores).to_numpy()
+    lfl = traded_ly & traded_cy & (first <= ly_start)
+    new = ~lfl & traded_cy & (first > ly_start)
+    closed = ~lfl & ~new & traded_ly & ((last < cy_start) | ~traded_cy)
+    labels = np.select([lfl, new, closed], ['LFL', 'New', 'Closed'], default='Inactive')
+    return pd.Series(labels, index=index['Store'].to_numpy(), name='Status')
+
+
+def stores_in_view(index, mode, windows, ly_stores, cy_stores):
+    """Stores shown in a View Mode, or None for HO (every store)"""
+    if mode == "YOY of HO":
+        return None
+    wanted = {
+        "YOY – Like-to-Like Stores (LFL)": 'LFL',
+        "Closed Stores": 'Closed',
+        "New Stores": 'New',
+    }[mode]
+    statuses = status(index, windows, ly_stores, cy_stores)
+    return tuple(sorted(statuses.index[statuses.to_numpy() == wanted]))
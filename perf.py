@@ -0,0 +1,254 @@
+"""Per-stage timing for the dashboards: wall time, rows and peak memory.
+
+A script run is recorded only when asked to, through the ``?debug=1`` query
+parameter (which also shows the sidebar panel) or the ``DASHBOARD_PERF_LOG``
+environment variable (which appends one JSON line per run to that file).
+Otherwise ``stage`` is a no-op costing a function call.
+
+Stages nest: a memoized pipeline stage that calls another is recorded with
+the inner one indented under it. Peak memory is the most traced by
+``tracemalloc`` above the level at the start of the stage. Tracing slows
+allocation-heavy code, so it only runs while a debug panel is open or with
+``DASHBOARD_PERF_MEMORY=1``; it is process-wide, so concurrent sessions can
+inflate each other's peaks.
+
+Each rerun of a Streamlit script may run on a new thread, so a run's
+recorder is kept in its session: the next run closes one left open by
+``st.stop``, a rerun or an exception. A recorder that is never closed stops
+its tracing when it is garbage collected with the session.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+LOG_ENV = 'DASHBOARD_PERF_LOG'
+MEMORY_ENV = 'DASHBOARD_PERF_MEMORY'
+
+SESSION_KEY = '_perf_recorder'
+
+_local = threading.local()  # recorders of runs outside a Streamlit session
+_log_lock = threading.Lock()
+_tracing_lock = threading.Lock()
+_tracing_runs = 0  # recording runs that trace memory
+
+
+def _start_tracing():
+    global _tracing_runs
+    with _tracing_lock:
+        _tracing_runs += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def _stop_tracing():
+    global _tracing_runs
+    with _tracing_lock:
+        _tracing_runs -= 1
+        if _tracing_runs == 0:
+            tracemalloc.stop()
+
+
+class Timing:
+    """Handle yielded by ``stage``; set ``rows`` once the stage knows its size"""
+
+    def __init__(self, rows=None):
+        self.rows = rows
+
+
+def rows_of(value):
+    """Row count of a stage result (the first element of a tuple), if it has one"""
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(value)
+    return None
+
+
+class Recorder:
+    """Stage records of one script run"""
+
+    def __init__(self, app, panel=False, log_path=None, memory=False):
+        self.app = app
+        self.panel = panel
+        self.log_path = log_path
+        self.memory = memory
+        self.started = time.perf_counter()
+        self.records = []
+        self._stack = []  # [traced at start, highest peak seen] per open stage
+        if memory:
+            _start_tracing()
+            self._release = weakref.finalize(self, _stop_tracing)
+
+    def close(self):
+        if self.memory:
+            self.memory = False
+            self._release()
+
+    def _memory(self):
+        return tracemalloc.get_traced_memory() if self.memory else (0, 0)
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        entry = {'stage': name, 'depth': len(self._stack), 'seconds': None,
+                 'rows': rows, 'peak_mb': None, 'cached': False}
+        self.records.append(entry)
+        if self.memory:
+            # An inner stage resets the peak, so the outer one keeps its own
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], self._memory()[1])
+            tracemalloc.reset_peak()
+        traced = self._memory()[0]
+        frame = [traced, traced]
+        self._stack.append(frame)
+        timing = Timing(rows)
+        start = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            entry['seconds'] = time.perf_counter() - start
+            entry['rows'] = timing.rows
+            self._stack.pop()
+            if self.memory:
+                peak = max(frame[1], self._memory()[1])
+                entry['peak_mb'] = (peak - frame[0]) / 1024 ** 2
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+
+    def record(self, name, seconds, rows=None, cached=False):
+        self.records.append({'stage': name, 'depth': len(self._stack), 'seconds': seconds,
+                             'rows': rows, 'peak_mb': None, 'cached': cached})
+
+    def to_dict(self):
+        return {
+            'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+            'app': self.app,
+            'run_seconds': time.perf_counter() - self.started,
+            'stages': self.records,
+        }
+
+    def write_log(self):
+        line = json.dumps(self.to_dict())
+        with _log_lock, open(self.log_path, 'a') as f:
+            f.write(line + '\n')
+
+
+def _session_state():
+    """Session state of the Streamlit script run on this thread, or None"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_state if ctx is not None else None
+
+
+def _set_current(recorder):
+    state = _session_state()
+    if state is not None:
+        state[SESSION_KEY] = recorder
+    else:
+        _local.recorder = recorder
+
+
+def current():
+    """The recorder of the current script run, or None"""
+    state = _session_state()
+    if state is not None:
+        return state[SESSION_KEY] if SESSION_KEY in state else None
+    return getattr(_local, 'recorder', None)
+
+
+def begin(app, debug=False):
+    """Start recording this script run when debugging or logging is on"""
+    previous = current()
+    if previous is not None:
+        # The last run stopped or reran before reaching ``end``
+        previous.close()
+    log_path = os.environ.get(LOG_ENV)
+    recorder = None
+    if debug or log_path:
+        memory = debug or os.environ.get(MEMORY_ENV) == '1'
+        recorder = Recorder(app, panel=debug, log_path=log_path, memory=memory)
+    _set_current(recorder)
+    return recorder
+
+
+@contextmanager
+def stage(name, rows=None):
+    """Time the enclosed block as a stage of the current run"""
+    recorder = current()
+    if recorder is None:
+        yield Timing(rows)
+        return
+    with recorder.stage(name, rows) as timing:
+        yield timing
+
+
+def record(name, seconds, rows=None, cached=False):
+    """Add a stage timed elsewhere, e.g. a cache hit or a background load"""
+    recorder = current()
+    if recorder is not None:
+        recorder.record(name, seconds, rows, cached)
+
+
+def end():
+    """Finish the run: append it to the log and draw the panel if enabled"""
+    recorder = current()
+    if recorder is None:
+        return
+    _set_current(None)
+    recorder.close()
+    if recorder.log_path:
+        recorder.write_log()
+    if recorder.panel:
+        render_panel(recorder)
+
+
+def _points(fig):
+    """Data points a Plotly figure sends to the browser"""
+    total = 0
+    for trace in fig.data:
+        for attr in ('x', 'z', 'lat', 'values'):
+            values = getattr(trace, attr, None)
+            if values is not None:
+                total += int(np.size(values))
+                break
+    return total
+
+
+def plotly_chart(fig, **kwargs):
+    """``st.plotly_chart``, timed as a stage: Plotly serialisation and sending"""
+    import streamlit as st
+
+    title = fig.layout.title.text or 'untitled'
+    with stage(f"chart: {title}", rows=_points(fig)):
+        return st.plotly_chart(fig, **kwargs)
+
+
+def render_panel(recorder):
+    """Sidebar table of the run's stages"""
+    import streamlit as st
+
+    table = pd.DataFrame(recorder.records, columns=['stage', 'depth', 'seconds', 'rows', 'peak_mb', 'cached'])
+    table['stage'] = ['· ' * d + s for d, s in zip(table['depth'], table['stage'])]
+    table['ms'] = table['seconds'] * 1000
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        st.caption(f"Run: {(time.perf_counter() - recorder.started) * 1000:,.0f} ms, "
+                   f"{len(table)} stages, {int(table['cached'].sum())} cached")
+        st.dataframe(
+            table[['stage', 'ms', 'rows', 'peak_mb', 'cached']],
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                'ms': st.column_config.NumberColumn("ms", format="%.1f"),
+                'peak_mb': st.column_config.NumberColumn("peak MB", format="%.1f"),
+            }
+        )
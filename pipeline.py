@@ -0,0 +1,390 @@
+"""Memoized dashboard pipeline: load -> align -> filter -> CY/LY split -> aggregates.
+
+Each stage is cached on its own inputs only, so a rerun triggered by a widget
+that does not feed a stage (e.g. the alert threshold slider) reuses the cached
+result instead of recomputing it. Stage runs and cache hits are recorded by
+``perf`` when a run is being profiled. Caches are process-wide, bounded, and keyed
+on the dataset's content key, so sessions looking at the same data share them.
+Returned frames are shared between reruns and must not be modified in place.
+
+A dataset is either an in-memory ``SalesDataset`` or a ``DatabaseDataset``
+(see ``backends``); for the latter, stages push their filters and groupbys
+down to the database instead of slicing the daily table.
+"""
+import functools
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import pandas as pd
+
+from aggregation import build_cube, group_totals, store_yoy, category_yoy, store_category_yoy, year_table
+import alignment
+import backends
+from dataset import SalesDataset, derived_key
+import lifecycle
+import perf
+import registry
+import rollups
+from file_cache import read_table
+from forecasting import forecast
+from schema import day_of, to_dates
+from streaming import stream_csv
+
+PERIODS = [
+    "Christmas (20-25 Dec)",
+    "December Full Month",
+    "January MTD",
+    "Last 7 Days",
+    "Last 30 Days",
+    "Last Quarter"
+]
+
+EPOCH = date(1970, 1, 1)
+
+
+def _freeze(value):
+    """Turn stage arguments into a hashable cache key"""
+    if isinstance(value, (SalesDataset, backends.DatabaseDataset)):
+        return ('dataset', value.key)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted((_freeze(v) for v in value), key=repr))
+    return value
+
+
+_stages = []
+
+
+def memoize(maxsize=16, key=None):
+    """LRU-cache a stage on its arguments, evicting the least recently used entry"""
+    def decorator(func):
+        cache = OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            cache_key = key(*args) if key is not None else _freeze(args)
+            with lock:
+                if cache_key in cache:
+                    cache.move_to_end(cache_key)
+                    result = cache[cache_key]
+                    perf.record(func.__name__, 0.0, perf.rows_of(result), cached=True)
+                    return result
+            with perf.stage(func.__name__) as timing:
+                result = func(*args)
+                timing.rows = perf.rows_of(result)
+            with lock:
+                cache[cache_key] = result
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return result
+
+        def discard(dataset_key):
+            with lock:
+                for cache_key in [k for k in cache if isinstance(k, tuple) and ('dataset', dataset_key) in k]:
+                    del cache[cache_key]
+
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_discard = discard
+        _stages.append(wrapper)
+        return wrapper
+    return decorator
+
+
+def clear_caches():
+    """Empty every stage cache, e.g. to time stages from cold"""
+    for stage in _stages:
+        stage.cache_clear()
+
+
+def selection(stores=None, categories=None, period=None):
+    """Normalise sidebar state into the hashable selection used as a stage key.
+
+    ``period`` is either a predefined period name or a (start, end) pair.
+    """
+    stores = tuple(sorted(stores)) if stores is not None else None
+    categories = tuple(sorted(categories)) if categories is not None else None
+    if isinstance(period, (list, tuple)):
+        period = (pd.Timestamp(period[0]), pd.Timestamp(period[1]))
+    return stores, categories, period
+
+
+# -----------------------------
+# STAGE 1 — LOAD
+# -----------------------------
+def load_stage(source, content_key, backend=backends.IN_MEMORY, progress=None):
+    """Handle to the shared dataset for an uploaded file, built once per distinct content.
+
+    CSVs are streamed in chunks straight into the daily aggregate; workbooks
+    go through the columnar file cache. With a database ``backend`` the
+    daily aggregate is written to (or reopened from) a database file instead
+    of being held in memory. ``progress(fraction, message)`` is called as
+    the load advances, so it can run as a ``background`` job.
+    """
+    if backend != backends.IN_MEMORY:
+        key = derived_key(content_key, backend)
+        return registry.acquire(key, lambda: backends.load(source, content_key, backend, key, progress=progress))
+    if getattr(source, 'name', '').lower().endswith('.csv'):
+        return registry.acquire(content_key, lambda: stream_csv(source, content_key, progress=progress))
+
+    def build():
+        if progress is not None:
+            progress(None, "Parsing workbook...")
+        df = read_table(source)
+        if progress is not None:
+            progress(0.8, "Building aggregates...")
+        return SalesDataset.from_frame(df, key=content_key)
+    return registry.acquire(content_key, build)
+
+
+@registry.on_release
+def _discard_released(dataset_key):
+    """Drop cached stage results for a dataset no session is using"""
+    for stage in _stages:
+        stage.cache_discard(dataset_key)
+
+
+# -----------------------------
+# STAGE 2 — FILTER
+# -----------------------------
+def _day(year, month, day):
+    return (date(year, month, day) - EPOCH).days
+
+
+def period_ranges(period, first_day, last_day):
+    """Inclusive (start_day, end_day) day-number ranges covered by a period.
+
+    ``period`` is a predefined period name or a (start, end) Timestamp pair;
+    relative periods count back from the last day in the dataset.
+    """
+    if isinstance(period, tuple):
+        start, end = period
+        return [(day_of(start), day_of(end))]
+
+    first_year = (EPOCH + timedelta(days=first_day)).year
+    last_year = (EPOCH + timedelta(days=last_day)).year
+    all_years = range(first_year, last_year + 1)
+
+    if period == "Christmas (20-25 Dec)":
+        return [(_day(y, 12, 20), _day(y, 12, 25)) for y in all_years]
+    if period == "December Full Month":
+        return [(_day(y, 12, 1), _day(y, 12, 31)) for y in all_years]
+    if period == "January MTD":
+        return [(_day(y, 1, 1), min(_day(y, 1, 31), last_day)) for y in all_years]
+    if period == "Last 7 Days":
+        return [(last_day - 7, last_day)]
+    if period == "Last 30 Days":
+        return [(last_day - 30, last_day)]
+    if period == "Last Quarter":
+        return [(last_day - 90, last_day)]
+    raise ValueError(f"Unknown period: {period}")
+
+
+def covered_ranges(dataset, period):
+    """The period's day ranges clipped to the days the dataset covers, in date order"""
+    first_day, last_day = dataset.first_day, dataset.last_day
+    if first_day is None:
+        return []
+    if period is None:
+        return [(first_day, last_day)]
+    ranges = sorted((max(start, first_day), min(end, last_day))
+                    for start, end in period_ranges(period, first_day, last_day))
+    return [(start, end) for start, end in ranges if start <= end]
+
+
+@memoize(maxsize=32)
+def align_stage(dataset, period, calendar="Calendar", years=2):
+    """(Day, Aligned_Day, Year) pairs comparing the period's CY days with the ``years`` - 1 years before"""
+    return alignment.comparison(covered_ranges(dataset, period), calendar, years)
+
+
+@memoize(maxsize=32)
+def trading_stage(dataset, period, calendar="Calendar", years=2):
+    """(LY stores, CY stores): the stores with sales on the period's LY and CY comparison days"""
+    pairs = align_stage(dataset, period, calendar, years)
+    current_year = int(pairs['Year'].max())
+    cube = cube_stage(dataset, None, None, period, calendar, years)
+    totals = group_totals(cube, ['Store', 'Year'])
+    totals = totals[totals['Sales'].to_numpy() > 0]
+    year = totals['Year'].to_numpy()
+    return (tuple(totals['Store'][year == current_year - 1].astype(str)),
+            tuple(totals['Store'][year == current_year].astype(str)))
+
+
+@memoize(maxsize=32)
+def view_stage(dataset, stores, period, mode, calendar="Calendar", years=2):
+    """Store selection narrowed to the View Mode's stores for the period.
+
+    Combines the dataset's precomputed lifecycle index with the HO cube of
+    the period (shared with the HO view), so switching modes never scans
+    the daily table. Returns None when every store is shown.
+    """
+    pairs = align_stage(dataset, period, calendar, years)
+    if not len(pairs) or mode == "YOY of HO":
+        return stores
+    ly_stores, cy_stores = trading_stage(dataset, period, calendar, years)
+    view = lifecycle.stores_in_view(dataset.lifecycle, mode, alignment.windows(pairs), ly_stores, cy_stores)
+    if view is None:
+        return stores
+    if stores is None:
+        return view
+    in_view = set(view)
+    return tuple(s for s in stores if s in in_view)
+
+
+def _in_database(dataset):
+    return isinstance(dataset, backends.DatabaseDataset)
+
+
+def _rows(dataset, stores, categories, ranges=None):
+    """Daily rows inside the day ranges (all days if None) for the selected stores and categories"""
+    if _in_database(dataset):
+        return dataset.rows(stores, categories, ranges)
+    df = dataset.daily if ranges is None else dataset.slice_days(ranges)
+    if stores is not None:
+        df = df[df['Store'].isin(stores)]
+    if categories is not None and 'Category' in df.columns:
+        df = df[df['Category'].isin(categories)]
+    return df
+
+
+@memoize(maxsize=16)
+def filter_stage(dataset, stores, categories, period, calendar="Calendar", years=2):
+    """Daily rows for the selected stores and categories on the period's comparison days.
+
+    The CY days and the aligned days of the earlier years are cut out of the
+    date-sorted daily table with ``searchsorted`` before the (much smaller)
+    store and category filters run; one merge on the day number then labels
+    every row with the comparison Year it counts towards and Aligned_Day,
+    the CY day it is compared on. With no period, every row is returned
+    unlabelled.
+    """
+    if period is None or dataset.first_day is None:
+        return _rows(dataset, stores, categories)
+    pairs = align_stage(dataset, period, calendar, years)
+    ranges = alignment.day_ranges(pairs['Day'])
+    if _in_database(dataset):
+        # The merge runs as a join in the database
+        return dataset.rows(stores, categories, ranges, pairs)
+    df = _rows(dataset, stores, categories, ranges)
+    return df.merge(pairs, on='Day', sort=False)
+
+
+# -----------------------------
+# STAGE 3 — CY / LY SPLIT
+# -----------------------------
+@memoize(maxsize=16)
+def split_stage(dataset, stores, categories, period, calendar="Calendar", years=2):
+    """(df_cy, current_year, last_year) for the filtered rows.
+
+    The current year comes from the period's comparison, not the filtered
+    rows, so a view of closed stores still compares against this year
+    rather than the last year they traded.
+    """
+    df = filter_stage(dataset, stores, categories, period, calendar, years)
+    pairs = align_stage(dataset, period, calendar, years)
+    if not len(df) or not len(pairs):
+        return df, None, None
+
+    current_year = int(pairs['Year'].max())
+    return df[df['Year'].to_numpy() == current_year], current_year, current_year - 1
+
+
+# -----------------------------
+# STAGE 4 — AGGREGATES
+# -----------------------------
+def daily_totals(df):
+    """Total sales per day as a Series indexed by Date"""
+    totals = group_totals(df, ['Day'])
+    return pd.Series(totals['Sales'].to_numpy(), index=to_dates(totals['Day']).rename('Date'), name='Sales')
+
+
+def aligned_daily_totals(df):
+    """Total sales per comparison Year and aligned Date, so LY days plot on their CY dates"""
+    totals = group_totals(df, ['Year', 'Aligned_Day'])
+    totals.insert(0, 'Date', to_dates(totals['Aligned_Day']))
+    return totals[['Date', 'Year', 'Sales']]
+
+
+@memoize(maxsize=16)
+def cube_stage(dataset, stores, categories, period, calendar="Calendar", years=2):
+    """(Store, Category, Year) cube of the filtered rows; enough for the KPI cards"""
+    if _in_database(dataset) and period is not None:
+        pairs = align_stage(dataset, period, calendar, years)
+        return dataset.totals(['Store', 'Category', 'Year'], stores, categories,
+                              alignment.day_ranges(pairs['Day']), pairs)
+    return build_cube(filter_stage(dataset, stores, categories, period, calendar, years))
+
+
+@memoize(maxsize=16)
+def aggregate_stage(dataset, stores, categories, period, calendar="Calendar", years=2):
+    """Cube and derived YOY tables shared by every tab"""
+    df = filter_stage(dataset, stores, categories, period, calendar, years)
+    _, current_year, last_year = split_stage(dataset, stores, categories, period, calendar, years)
+
+    cube = cube_stage(dataset, stores, categories, period, calendar, years)
+    result = {
+        'cube': cube,
+        'store_df': store_yoy(cube, current_year, last_year).sort_values('YOY_%', ascending=True),
+        'daily_sales': aligned_daily_totals(df),
+        'year_df': year_table(cube, 'Store', range(current_year - years + 1, current_year + 1))
+    }
+    if 'Category' in df.columns:
+        result['category_df'] = category_yoy(cube, current_year, last_year)
+        result['store_category_df'] = store_category_yoy(cube, current_year, last_year)
+    return result
+
+
+@memoize(maxsize=32)
+def rollup_stage(dataset, stores, categories, period, freq, calendar="Calendar", years=2):
+    """Weekly ('W') or monthly ('M') sales per Year for the selection, with axis labels.
+
+    Covers the comparison's CY and LY days. Whole weeks/months inside them
+    come from the dataset's rollup tables; only partial ones at the edges
+    are summed from daily rows.
+    """
+    column = rollups.FREQUENCIES[freq]
+    if period is None:
+        ranges = [(dataset.first_day, dataset.last_day)]
+    else:
+        ranges = alignment.day_ranges(align_stage(dataset, period, calendar, years)['Day'])
+    if _in_database(dataset):
+        # Sales per day from the database, bucketed here
+        days = dataset.totals(['Day'], stores, categories, ranges)
+        if not len(days):
+            return pd.DataFrame(columns=[column, 'Year', 'Sales'])
+        totals = rollups.build(days, freq)[[column, 'Year', 'Sales']]
+        totals[column] = rollups.labels(totals[column], freq)
+        return totals
+    df = _rows(dataset, stores, categories, ranges)
+    if not len(df):
+        return pd.DataFrame(columns=[column, 'Year', 'Sales'])
+    totals = rollups.period_totals(dataset.rollup(freq), df, ranges, freq, stores, categories)
+    totals[column] = rollups.labels(totals[column], freq)
+    return totals
+
+
+# -----------------------------
+# STAGE 5 — FORECAST
+# -----------------------------
+@memoize(maxsize=16)
+def history_stage(dataset, stores, categories):
+    """Sales per (Day, Store) over the full history of the selected stores and categories"""
+    if _in_database(dataset):
+        return dataset.totals(['Day', 'Store'], stores, categories)
+    return group_totals(filter_stage(dataset, stores, categories, None), ['Day', 'Store'])
+
+
+@memoize(maxsize=16)
+def forecast_stage(dataset, stores, categories, model):
+    """Per-store daily forecasts for the days after the dataset ends.
+
+    Fitted on the full history of the selected stores and categories, not
+    just the selected period, since the forecast continues from the last day.
+    """
+    df = history_stage(dataset, stores, categories)
+    if not len(df):
+        return None
+    return forecast(df, ('Store',), model, selection=_freeze((stores, categories)))
@@ -0,0 +1,112 @@
+"""Process-wide registry of shared, read-only datasets.
+
+Every browser session that loads the same content gets the same
+``SalesDataset`` object instead of its own copy. Sessions hold a
+``DatasetHandle``; when the last handle for a dataset is dropped (the
+session ends or switches data) the dataset is released and any callbacks
+registered with ``on_release`` run, so caches keyed on it can be purged.
+"""
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+_lock = threading.Lock()
+_entries = {}        # key -> [dataset, refcount]
+_build_locks = {}    # key -> lock held while the dataset is being built
+_release_callbacks = []
+
+
+def _freeze_array(values):
+    """Mark the ndarray backing a column (and its base) read-only"""
+    if isinstance(values, pd.Categorical):
+        values = values.codes
+    while isinstance(values, np.ndarray):
+        values.flags.writeable = False
+        values = values.base
+
+
+def freeze(dataset):
+    """Mark the arrays behind a dataset's frames and day index read-only.
+
+    In-place writes into shared buffers then raise instead of silently
+    changing what other sessions see. Frames themselves must still be
+    treated as immutable: derive new frames rather than assigning columns.
+    Database-backed datasets only hold their lifecycle index.
+    """
+    for name in ('frame', 'daily', 'cube', 'weekly', 'monthly', 'lifecycle'):
+        frame = getattr(dataset, name, None)
+        if frame is None:
+            continue
+        for col in frame.columns:
+            _freeze_array(frame[col].array if isinstance(frame[col].dtype, pd.CategoricalDtype)
+                          else frame[col].to_numpy())
+    _freeze_array(getattr(dataset, 'days', None))
+    return dataset
+
+
+class DatasetHandle:
+    """A session's reference to a shared dataset; releases it when collected"""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.key = dataset.key
+        self._finalizer = weakref.finalize(self, release, dataset.key)
+
+    def close(self):
+        self._finalizer()
+
+
+def acquire(key, factory):
+    """Return a handle to the dataset for ``key``, building it with ``factory`` if needed"""
+    with _lock:
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+
+    # Concurrent sessions loading the same content wait for a single build
+    with build_lock:
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None:
+                entry[1] += 1
+                return DatasetHandle(entry[0])
+
+        try:
+            dataset = freeze(factory())
+            dataset.key = key
+            with _lock:
+                _entries[key] = [dataset, 1]
+        finally:
+            with _lock:
+                _build_locks.pop(key, None)
+        return DatasetHandle(dataset)
+
+
+def release(key):
+    """Drop one reference to ``key``; the dataset is discarded at zero"""
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        del _entries[key]
+        callbacks = list(_release_callbacks)
+    for callback in callbacks:
+        callback(key)
+
+
+def on_release(callback):
+    """Register ``callback(key)`` to run when a dataset is released"""
+    _release_callbacks.append(callback)
+    return callback
+
+
+def stats():
+    """Shared datasets currently held, with their session counts and row counts"""
+    with _lock:
+        return pd.DataFrame([
+            {'Dataset': key[:8], 'Sessions': count, 'Rows': dataset.n_rows}
+            for key, (dataset, count) in _entries.items()
+        ], columns=['Dataset', 'Sessions', 'Rows'])
@@ -0,0 +1,101 @@
+"""Weekly and monthly rollups of the daily table.
+
+Buckets are integer keys, never strings: a week is the day number of its
+Monday (ISO weeks), a month is the number of months since 1970-01. Rollups
+are summed per (bucket, Year, Store, Category); Year is the calendar year of
+the days, so a week spanning New Year is split in two, as the weekly chart
+has always shown it. Labels are only formatted for the handful of buckets
+that end up on a chart axis.
+"""
+import numpy as np
+import pandas as pd
+
+from aggregation import group_totals
+from schema import to_dates, years_of
+
+FREQUENCIES = {'W': 'Week', 'M': 'Month'}
+
+
+def week_of(days):
+    """Day number of the Monday starting each day's ISO week"""
+    days = np.asarray(days, dtype=np.int64)
+    # 1970-01-05, day 4, was a Monday
+    return (days - (days - 4) % 7).astype(np.int32)
+
+
+def month_of(days):
+    """Months since 1970-01 for each day number"""
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[M]').astype(np.int32)
+
+
+def bucket_of(days, freq):
+    return week_of(days) if freq == 'W' else month_of(days)
+
+
+def bucket_bounds(buckets, freq):
+    """(first_day, last_day) of each bucket key"""
+    buckets = np.asarray(buckets, dtype=np.int64)
+    if freq == 'W':
+        return buckets, buckets + 6
+    starts = buckets.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    ends = (buckets + 1).astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) - 1
+    return starts, ends
+
+
+def labels(buckets, freq):
+    """Axis labels, in the format pandas periods print ('2024-12-16/2024-12-22', '2024-12')"""
+    starts, ends = bucket_bounds(buckets, freq)
+    if freq == 'W':
+        start_text = to_dates(starts).strftime('%Y-%m-%d')
+        end_text = to_dates(ends).strftime('%Y-%m-%d')
+        return [f"{s}/{e}" for s, e in zip(start_text, end_text)]
+    return list(to_dates(starts).strftime('%Y-%m'))
+
+
+def build(daily, freq):
+    """Rollup of a daily table to (bucket, Year, Store, Category), sorted by bucket"""
+    column = FREQUENCIES[freq]
+    keys = [column, 'Year'] + [k for k in ('Store', 'Category') if k in daily.columns]
+    days = daily['Day'].to_numpy()
+    return group_totals(daily, keys, derived={column: bucket_of(days, freq), 'Year': years_of(days)})
+
+
+def full_buckets(ranges, freq):
+    """Bucket keys lying entirely inside one of the inclusive day ranges"""
+    keys = []
+    for start, end in ranges:
+        if freq == 'W':
+            candidates = np.arange(week_of([start])[0], end + 1, 7)
+        else:
+            candidates = np.arange(month_of([start])[0], month_of([end])[0] + 1)
+        lo, hi = bucket_bounds(candidates, freq)
+        keys.append(candidates[(lo >= start) & (hi <= end)])
+    return np.unique(np.concatenate(keys)) if keys else np.array([], dtype=np.int64)
+
+
+def period_totals(rollup, daily, ranges, freq, stores=None, categories=None):
+    """Sales per (bucket, Year) over the given day ranges.
+
+    Buckets lying wholly inside a range are read from the rollup; only the
+    partial buckets at the edges of a range are summed from ``daily``, which
+    must already be cut to the ranges and to the store/category selection.
+    """
+    column = FREQUENCIES[freq]
+    full = full_buckets(ranges, freq)
+
+    mask = rollup[column].isin(full).to_numpy()
+    if stores is not None:
+        mask &= rollup['Store'].isin(stores).to_numpy()
+    if categories is not None and 'Category' in rollup.columns:
+        mask &= rollup['Category'].isin(categories).to_numpy()
+    inner = rollup.loc[mask, [column, 'Year', 'Sales']]
+
+    edge_days = daily['Day'].to_numpy()
+    edge_buckets = bucket_of(edge_days, freq)
+    edge_mask = ~np.isin(edge_buckets, full)
+    edges = group_totals(daily[edge_mask], [column, 'Year'], derived={
+        column: edge_buckets[edge_mask], 'Year': years_of(edge_days[edge_mask])
+    })[[column, 'Year', 'Sales']]
+
+    totals = pd.concat([inner, edges], ignore_index=True)
+    return totals.groupby([column, 'Year'], sort=True)['Sales'].sum().reset_index()
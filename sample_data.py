@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+DEFAULT_STORES = [
+    "MENS CLUB SHANKARPALLY",
+    "MENS CLUB BHONGIR",
+    "MENS CLUB KORUTLA STORE",
+    "MENS CLUB BELLAMPALLY",
+    "RAJ FASHIONS RETAIL LLP-NAGAKURNOOL",
+    "DIAMOND JUBILEE FASHIONS-NALGONDA",
+    "RAJ FASHIONS RETAIL LLP-M27 WARANGAL",
+    "FASHION UNLIMITED -KODAD"
+]
+
+DEFAULT_CATEGORIES = ["Shirts", "Trousers", "Shoes", "Accessories", "Suits", "Casual Wear"]
+
+
+def _names(defaults, n, prefix):
+    """Take the first n default names, padding with numbered synthetic ones"""
+    names = list(defaults[:n])
+    names += [f"{prefix} {i:04d}" for i in range(len(names) + 1, n + 1)]
+    return names
+
+
+def _date_factor(dates):
+    """Seasonality (higher sales in Dec, lower in summer) times YOY growth for each date"""
+    month = dates.month.to_numpy()
+    month_factor = np.where(month == 12, 1.5, np.where(np.isin(month, [5, 6, 7]), 0.8, 1.0))
+    year = dates.year.to_numpy()
+    return month_factor * 1.1 ** (year - year.min())
+
+
+def generate_sample_data(n_stores=8, n_categories=6, start='2023-01-01', end='2024-12-31', rng=None):
+    """Generate sample sales data for demonstration and load testing.
+
+    Builds the full Date x Store x Category cube in one batched pass.
+    Pass a seeded ``np.random.Generator`` for reproducible output.
+    """
+    if rng is None:
+        rng = np.random.default_rng(42)
+
+    stores = _names(DEFAULT_STORES, n_stores, "STORE")
+    categories = _names(DEFAULT_CATEGORIES, n_categories, "Category")
+    dates = pd.date_range(start=start, end=end, freq='D')
+
+    n_dates, n_cells = len(dates), n_stores * n_categories
+    n_rows = n_dates * n_cells
+
+    # Row order is date-major, then store, then category
+    date_idx = np.repeat(np.arange(n_dates), n_cells)
+    store_idx = np.tile(np.repeat(np.arange(n_stores), n_categories), n_dates)
+    category_idx = np.tile(np.arange(n_categories), n_dates * n_stores)
+
+    # Evaluated once per date and broadcast to every row of that date
+    date_factor = _date_factor(dates)[date_idx]
+
+    base_sales = rng.uniform(5000, 50000, n_rows)
+    store_factor = rng.uniform(0.7, 1.3, n_rows)
+    sales = base_sales * store_factor * date_factor
+
+    units = (sales / rng.uniform(200, 800, n_rows)).astype(np.int64)
+
+    # Each store keeps a fixed location
+    latitude = rng.uniform(17.0, 18.5, n_stores)
+    longitude = rng.uniform(78.0, 80.0, n_stores)
+
+    return pd.DataFrame({
+        'Date': dates[date_idx],
+        'Store': pd.Categorical.from_codes(store_idx, stores),
+        'Category': pd.Categorical.from_codes(category_idx, categories),
+        'Sales': sales,
+        'Units_Sold': units,
+        'Latitude': latitude[store_idx],
+        'Longitude': longitude[store_idx]
+    })
+
+
+def generate_transactions(n_rows, n_stores=8, n_categories=6, start='2023-01-01', end='2024-12-31', rng=None):
+    """Generate ``n_rows`` sales lines on random days, stores and categories.
+
+    Unlike ``generate_sample_data`` the row count is fixed rather than the
+    cube, so any number of rows can be spread over any number of stores;
+    lines for the same Date/Store/Category are summed when loaded.
+    """
+    if rng is None:
+        rng = np.random.default_rng(42)
+
+    stores = _names(DEFAULT_STORES, n_stores, "STORE")
+    categories = _names(DEFAULT_CATEGORIES, n_categories, "Category")
+    dates = pd.date_range(start=start, end=end, freq='D')
+
+    date_idx = np.sort(rng.integers(0, len(dates), n_rows))
+    store_idx = rng.integers(0, n_stores, n_rows)
+    category_idx = rng.integers(0, n_categories, n_rows)
+
+    sales = rng.uniform(500, 5000, n_rows) * _date_factor(dates)[date_idx]
+    units = (sales / rng.uniform(200, 800, n_rows)).astype(np.int64)
+
+    latitude = rng.uniform(17.0, 18.5, n_stores)
+    longitude = rng.uniform(78.0, 80.0, n_stores)
+
+    return pd.DataFrame({
+        'Date': dates[date_idx],
+        'Store': pd.Categorical.from_codes(store_idx, stores),
+        'Category': pd.Categorical.from_codes(category_idx, categories),
+        'Sales': sales,
+        'Units_Sold': units,
+        'Latitude': latitude[store_idx],
+        'Longitude': longitude[store_idx]
+    })
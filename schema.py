@@ -0,0 +1,111 @@
+"""Compact in-memory schema for sales frames.
+
+Frames are normalised once at load: Store/Category become categoricals,
+Sales is float32, Units_Sold int32, and Date is replaced by ``Day``, an
+int32 count of days since 1970-01-01. Dates are only rebuilt for display,
+on already-aggregated results.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+CATEGORICAL_COLUMNS = ['Store', 'Category']
+FLOAT_COLUMNS = ['Sales']
+INT_COLUMNS = ['Units_Sold']
+
+
+def day_numbers(dates):
+    """Days since 1970-01-01 for datetime-like values"""
+    return np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int32)
+
+
+def to_dates(days):
+    """DatetimeIndex for an array of day numbers"""
+    return pd.DatetimeIndex(np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[ns]'))
+
+
+def day_of(value):
+    """Day number of a single date or Timestamp"""
+    return int(pd.Timestamp(value).to_datetime64().astype('datetime64[D]').astype(np.int64))
+
+
+def years_of(days):
+    """Calendar year for each day number"""
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype('datetime64[Y]').astype(np.int32) + 1970
+
+
+def normalize(df, date_format=None):
+    """Return ``df`` in the compact internal schema.
+
+    Rows without a Date are dropped, since they cannot fall in any period.
+    Pass ``date_format`` to parse dates with a fixed format instead of
+    inferring it.
+    """
+    dates = pd.to_datetime(df['Date'], format=date_format)
+    valid = dates.notna().to_numpy()
+    if not valid.all():
+        df, dates = df[valid], dates[valid]
+
+    columns = {'Day': day_numbers(dates)}
+    for col in df.columns:
+        if col == 'Date':
+            continue
+        values = df[col]
+        if col in CATEGORICAL_COLUMNS:
+            values = values.astype('category')
+        elif col in FLOAT_COLUMNS:
+            values = pd.to_numeric(values).astype(np.float32)
+        elif col in INT_COLUMNS:
+            values = pd.to_numeric(values).fillna(0).astype(np.int32)
+        columns[col] = values.to_numpy() if col not in CATEGORICAL_COLUMNS else values.array
+    return pd.DataFrame(columns)
+
+
+def concat(frames):
+    """Concatenate frames, merging categorical columns' categories so they stay categorical"""
+    frames = list(frames)
+    for col in CATEGORICAL_COLUMNS:
+        dtypes = [f[col].dtype for f in frames if col in f.columns]
+        if not dtypes or not all(isinstance(t, pd.CategoricalDtype) for t in dtypes):
+            continue
+        categories = dtypes[0].categories
+        for t in dtypes[1:]:
+            categories = categories.union(t.categories)
+        frames = [f.assign(**{col: f[col].cat.set_categories(categories)})
+                  if col in f.columns and not f[col].cat.categories.equals(categories) else f
+                  for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def with_dates(df):
+    """Frame with a Date column rebuilt from Day, in the original column order"""
+    out = df.drop(columns='Day')
+    out.insert(0, 'Date', to_dates(df['Day'].to_numpy()))
+    return out
+
+
+def nbytes(obj):
+    """Approximate memory held by a frame, series, array or container of them"""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sum(nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(nbytes(v) for v in obj)
+    if hasattr(obj, '__dict__') and not isinstance(obj, type):
+        return sum(nbytes(v) for v in vars(obj).values())
+    return sys.getsizeof(obj)
+
+
+def memory_report(objects):
+    """Table of memory held by each named object, largest first"""
+    report = pd.DataFrame({
+        'Object': list(objects),
+        'MB': [nbytes(obj) / 1024 ** 2 for obj in objects.values()]
+    })
+    return report.sort_values('MB', ascending=False, ignore_index=True)
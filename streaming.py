@@ -0,0 +1,95 @@
+"""Chunked CSV ingestion that reduces rows to the daily cube as it reads.
+
+Only one chunk of raw rows is alive at a time; each chunk is normalised and
+summed to (Day, Store, Category) before the next is read, so peak memory
+scales with the chunk size and the number of distinct daily keys rather
+than with the size of the file.
+"""
+import os
+
+import pandas as pd
+
+from aggregation import group_totals
+from dataset import REQUIRED_COLUMNS, SalesDataset
+from schema import concat, normalize
+
+CHUNK_SIZE = 250_000
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def _reduce(partials, keys):
+    """Collapse partial daily aggregates into one"""
+    if len(partials) == 1:
+        return partials[0]
+    return group_totals(concat(partials), keys, firsts=('Latitude', 'Longitude'))
+
+
+def _size(source):
+    """Total bytes in a path or seekable file object, or None if unknown"""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if hasattr(source, 'getbuffer'):
+        return source.getbuffer().nbytes
+    return None
+
+
+def daily_chunks(source, chunksize=CHUNK_SIZE, date_format=DATE_FORMAT, progress=None):
+    """Yield (keys, partial daily aggregate) for each chunk of a CSV path or file object.
+
+    ``progress(fraction, message)`` is called after each chunk with the share
+    of the file read so far, when the file size is known. Partials may
+    share keys; sum them to get the daily aggregate.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fh:
+            yield from daily_chunks(fh, chunksize, date_format, progress)
+        return
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    total = _size(source) if progress is not None else None
+
+    keys, rows_read = None, 0
+    with pd.read_csv(source, chunksize=chunksize) as reader:
+        for chunk in reader:
+            if keys is None:
+                # Fail fast on the first chunk rather than after reading the file
+                missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+                if missing:
+                    raise ValueError(f"Missing required columns: {missing}")
+                keys = [k for k in ('Day', 'Store', 'Category') if k == 'Day' or k in chunk.columns]
+
+            try:
+                rows = normalize(chunk, date_format=date_format)
+            except ValueError:
+                if date_format is None:
+                    raise
+                # Dates not in the fixed format: infer them for the rest of the file
+                date_format = None
+                rows = normalize(chunk)
+            rows_read += len(chunk)
+            if progress is not None:
+                fraction = source.tell() / total if total else None
+                progress(fraction, f"Read {rows_read:,} rows")
+            yield keys, group_totals(rows, keys, firsts=('Latitude', 'Longitude'))
+
+    if keys is None:
+        raise ValueError("File contains no rows")
+
+
+def stream_daily(source, chunksize=CHUNK_SIZE, date_format=DATE_FORMAT, progress=None):
+    """Read a CSV path or file object in chunks and return its daily aggregate"""
+    partials, pending_rows = [], 0
+    for keys, partial in daily_chunks(source, chunksize, date_format, progress):
+        partials.append(partial)
+        pending_rows += len(partial)
+
+        # Fold partials together once they hold as many rows as a chunk
+        if pending_rows > chunksize and len(partials) > 1:
+            partials = [_reduce(partials, keys)]
+            pending_rows = len(partials[0])
+    return _reduce(partials, keys)
+
+
+def stream_csv(source, key, chunksize=CHUNK_SIZE, date_format=DATE_FORMAT, progress=None):
+    """Stream a CSV into a dataset that only keeps the daily aggregate"""
+    return SalesDataset.from_daily(stream_daily(source, chunksize, date_format, progress), key)
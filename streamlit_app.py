@@ -1,11 +1,32 @@
+import os
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import numpy as np
-from datetime import datetime, timedelta
-import io
+from datetime import datetime
+
+from aggregation import cagr, group_totals, store_category_pivot, store_locations, yoy_pct
+from alignment import CALENDARS
+import background
+import backends
+import perf
+import registry
+from dataset import SalesDataset, derived_key
+from downsample import downsample_frame
+from export import FORMATS as EXPORT_FORMATS, export_bytes
+from file_cache import content_hash, read_table
+from forecasting import MODELS as FORECAST_MODELS
+from lazy_tabs import lazy_tabs, remember
+from lifecycle import VIEW_MODES
+from pipeline import (
+    PERIODS, selection, load_stage, filter_stage, split_stage, cube_stage, aggregate_stage,
+    view_stage, rollup_stage, history_stage, forecast_stage, daily_totals
+)
+from sample_data import generate_sample_data
+from schema import memory_report, to_dates, with_dates
+from verdicts import store_verdicts
+import workbooks
+
+EXPORTS = ["Sales rows", "Store YOY", "Category cube", "Execution verdicts"]
 
 # Page configuration
 st.set_page_config(
@@ -15,6 +36,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Stage timings; ?debug=1 shows them in the sidebar
+perf.begin('streamlit_app', debug=st.query_params.get('debug') == '1')
+
 # Custom CSS for better UI
 st.markdown("""
     <style>
@@ -57,58 +81,41 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # Initialize session state
+# `data` is the shared, read-only dataset; `dataset_handle` keeps this
+# session's reference to it alive in the process-wide registry
 if 'data' not in st.session_state:
     st.session_state.data = None
+if 'dataset_handle' not in st.session_state:
+    st.session_state.dataset_handle = None
+if 'source_key' not in st.session_state:
+    st.session_state.source_key = None
+if 'applied_drops' not in st.session_state:
+    st.session_state.applied_drops = set()
+if 'pending_load' not in st.session_state:
+    st.session_state.pending_load = None
+if 'file_hashes' not in st.session_state:
+    st.session_state.file_hashes = {}  # uploader file_id -> content hash
 
-# Helper function to generate sample data
-def generate_sample_data():
-    """Generate sample sales data for demonstration"""
-    np.random.seed(42)
-    
-    stores = [
-        "MENS CLUB SHANKARPALLY",
-        "MENS CLUB BHONGIR",
-        "MENS CLUB KORUTLA STORE",
-        "MENS CLUB BELLAMPALLY",
-        "RAJ FASHIONS RETAIL LLP-NAGAKURNOOL",
-        "DIAMOND JUBILEE FASHIONS-NALGONDA",
-        "RAJ FASHIONS RETAIL LLP-M27 WARANGAL",
-        "FASHION UNLIMITED -KODAD"
-    ]
-    
-    categories = ["Shirts", "Trousers", "Shoes", "Accessories", "Suits", "Casual Wear"]
-    
-    dates = pd.date_range(start='2023-01-01', end='2024-12-31', freq='D')
-    
-    data = []
-    for date in dates:
-        for store in stores:
-            for category in categories:
-                # Generate realistic sales patterns
-                base_sales = np.random.uniform(5000, 50000)
-                
-                # Add seasonality (higher sales in Dec, lower in summer)
-                month_factor = 1.5 if date.month == 12 else (0.8 if date.month in [5, 6, 7] else 1.0)
-                
-                # Add some stores performing better
-                store_factor = np.random.uniform(0.7, 1.3)
-                
-                # Year over year growth/decline
-                year_factor = 1.1 if date.year == 2024 else 1.0
-                
-                sales = base_sales * month_factor * store_factor * year_factor
-                
-                data.append({
-                    'Date': date,
-                    'Store': store,
-                    'Category': category,
-                    'Sales': sales,
-                    'Units_Sold': int(sales / np.random.uniform(200, 800)),
-                    'Latitude': np.random.uniform(17.0, 18.5),
-                    'Longitude': np.random.uniform(78.0, 80.0)
-                })
-    
-    return pd.DataFrame(data)
+def use_dataset(handle):
+    """Point this session at a shared dataset, releasing the previous one"""
+    previous = st.session_state.dataset_handle
+    st.session_state.dataset_handle = handle
+    st.session_state.data = handle.dataset
+    if previous is not None:
+        previous.close()
+
+def upload_hash(uploaded):
+    """Content hash of an uploaded file, read and hashed only the first time it is seen"""
+    hashes = st.session_state.file_hashes
+    if uploaded.file_id not in hashes:
+        hashes[uploaded.file_id] = content_hash(uploaded)
+    return hashes[uploaded.file_id]
+
+def poll_pending_load():
+    """Rerun shortly to check on an upload still loading in the background"""
+    if st.session_state.pending_load is not None:
+        background.wait()
+        st.rerun()
 
 # Sidebar
 with st.sidebar:
@@ -117,6 +124,13 @@ with st.sidebar:
     # Data Management Section
     st.header("🗂️ Data Management")
     
+    storage = st.selectbox(
+        "Storage",
+        backends.BACKENDS,
+        help="In memory is fastest; a database keeps uploads too large for memory on disk "
+             "and runs the filters and totals there"
+    )
+    
     uploaded_file = st.file_uploader(
         "Upload Sales Data (CSV/Excel)",
         type=['csv', 'xlsx', 'xls'],
@@ -124,34 +138,94 @@ with st.sidebar:
     )
     
     if uploaded_file is not None:
-        try:
-            if uploaded_file.name.endswith('.csv'):
-                st.session_state.data = pd.read_csv(uploaded_file)
+        # Only rebuild the dataset when a different file is uploaded, so
+        # appended daily drops survive reruns. The file is parsed on a
+        # worker thread; the rest of the page keeps rendering meanwhile.
+        upload_key = (upload_hash(uploaded_file), storage)
+        pending = st.session_state.pending_load
+        if upload_key != st.session_state.source_key and (pending is None or pending[0] != upload_key):
+            pending = (upload_key, background.submit(load_stage, uploaded_file, *upload_key))
+            st.session_state.pending_load = pending
+        
+        if pending is not None and pending[0] == upload_key:
+            job = pending[1]
+            if job.done():
+                st.session_state.pending_load = None
+                st.session_state.source_key = upload_key
+                try:
+                    use_dataset(job.result())
+                    perf.record('load', job.elapsed, rows=st.session_state.data.n_rows)
+                    st.session_state.applied_drops = set()
+                    st.success("✅ Data uploaded successfully!")
+                except Exception as e:
+                    st.error(f"Error loading file: {e}")
+            elif job.fraction is None:
+                st.status(f"{job.message} ({job.elapsed:.0f}s)", state="running")
             else:
-                st.session_state.data = pd.read_excel(uploaded_file)
-            st.session_state.data['Date'] = pd.to_datetime(st.session_state.data['Date'])
-            st.success("✅ Data uploaded successfully!")
-        except Exception as e:
-            st.error(f"Error loading file: {e}")
+                st.progress(job.fraction, text=f"{job.message} ({job.elapsed:.0f}s)")
+    else:
+        st.session_state.pending_load = None
     
     # Use sample data button
     if st.button("📝 Use Sample Data"):
-        with st.spinner("Generating sample data..."):
-            st.session_state.data = generate_sample_data()
+        with st.spinner("Generating sample data..."), perf.stage('load sample'):
+            use_dataset(registry.acquire('sample', lambda: SalesDataset.from_frame(generate_sample_data())))
+            st.session_state.applied_drops = set()
             st.success("✅ Sample data loaded!")
     
+    # Dataset harmonized from many LY/CY workbooks by workbooks.py
+    if workbooks.DATASET_PATH and os.path.isdir(workbooks.DATASET_PATH):
+        if st.button("📚 Use Workbook Dataset", help=f"Daily rows of {workbooks.DATASET_PATH}"):
+            with st.spinner("Reading workbook dataset..."), perf.stage('load dataset'):
+                dataset_path = workbooks.DATASET_PATH
+                use_dataset(registry.acquire(
+                    workbooks.dataset_key(dataset_path),
+                    lambda: SalesDataset.from_frame(
+                        workbooks.read_dataset(dataset_path)[['Date', 'Store', 'Sales', 'Units_Sold']]
+                    )
+                ))
+                st.session_state.applied_drops = set()
+                st.success("✅ Workbook dataset loaded!")
+    
+    # Incremental daily drops (database-backed data is read-only)
+    if isinstance(st.session_state.data, SalesDataset):
+        drop_file = st.file_uploader(
+            "Append Daily Sales (CSV/Excel)",
+            type=['csv', 'xlsx', 'xls'],
+            help="New days are merged into the loaded data; rows for an existing Date/Store/Category are replaced"
+        )
+        
+        if drop_file is not None:
+            # Known drops are recognised by file_id; only a new one is hashed
+            drop_key = upload_hash(drop_file)
+            if drop_key not in st.session_state.applied_drops:
+                try:
+                    base = st.session_state.data
+                    appended_key = derived_key(base.key, drop_key)
+                    with perf.stage('append'):
+                        use_dataset(registry.acquire(
+                            appended_key,
+                            lambda: base.append(read_table(drop_file), key=appended_key)
+                        ))
+                    st.session_state.applied_drops.add(drop_key)
+                    st.success("✅ Daily sales appended!")
+                except Exception as e:
+                    st.error(f"Error appending file: {e}")
+    
     st.divider()
     
     # Check if data is available
     if st.session_state.data is not None:
-        df = st.session_state.data
+        data = st.session_state.data
         
         # View Mode Selection
         st.header("🎯 View Mode")
         analysis_type = st.radio(
             "Select Analysis",
-            ["YOY – Like-to-Like Stores (LFL)", "YOY of HO", "Closed Stores", "New Stores"],
-            index=0
+            VIEW_MODES,
+            index=0,
+            help="LFL: stores trading through both periods; HO: all stores; "
+                 "Closed/New: stores that stopped or started trading in between"
         )
         
         st.divider()
@@ -168,32 +242,45 @@ with st.sidebar:
         if period_type == "Predefined Periods":
             period = st.selectbox(
                 "Select Period",
-                ["Christmas (20-25 Dec)", "December Full Month", "January MTD", "Last 7 Days", "Last 30 Days", "Last Quarter"]
+                PERIODS
             )
         else:
             col1, col2 = st.columns(2)
             with col1:
-                start_date = st.date_input("Start Date", df['Date'].min())
+                start_date = st.date_input("Start Date", to_dates([st.session_state.data.first_day])[0])
             with col2:
-                end_date = st.date_input("End Date", df['Date'].max())
+                end_date = st.date_input("End Date", to_dates([st.session_state.data.last_day])[0])
+        
+        calendar = st.selectbox(
+            "LY Alignment",
+            CALENDARS,
+            help="Calendar: same date last year; 364-day: same weekday 52 weeks earlier; "
+                 "Retail 4-5-4: same day of the same retail week last year"
+        )
+        n_years = st.slider(
+            "Years to Compare",
+            min_value=2,
+            max_value=5,
+            value=2,
+            help="Compare the period with the same aligned days in each earlier year"
+        )
         
         st.divider()
         
         # Filters
         st.header("🔍 Filters")
         
-        if 'Store' in df.columns:
-            selected_stores = st.multiselect(
-                "Select Stores",
-                options=df['Store'].unique(),
-                default=df['Store'].unique()
-            )
+        selected_stores = st.multiselect(
+            "Select Stores",
+            options=data.stores,
+            default=data.stores
+        )
         
-        if 'Category' in df.columns:
+        if data.categories is not None:
             selected_categories = st.multiselect(
                 "Select Categories",
-                options=df['Category'].unique(),
-                default=df['Category'].unique()
+                options=data.categories,
+                default=data.categories
             )
         
         # Alert Threshold
@@ -207,77 +294,44 @@ with st.sidebar:
             help="Get alerts for stores with YOY decline below this threshold"
         )
         
-        st.divider()
-        
-        # Export Options
-        st.header("💾 Export Options")
-        export_df = df.copy()
-        
-        if st.button("📥 Download CSV"):
-            csv = export_df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Click to Download",
-                data=csv,
-                file_name=f"sales_data_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
-            )
-        
-        if st.button("📥 Download Excel"):
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                export_df.to_excel(writer, index=False, sheet_name='Sales Data')
-            st.download_button(
-                label="Click to Download",
-                data=buffer.getvalue(),
-                file_name=f"sales_data_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
     else:
         st.warning("⚠️ Please upload data or use sample data to begin")
 
 # Main Content
 if st.session_state.data is not None:
-    df = st.session_state.data.copy()
+    dataset = st.session_state.data
     
-    # Apply filters
-    if 'selected_stores' in locals():
-        df = df[df['Store'].isin(selected_stores)]
-    if 'selected_categories' in locals():
-        df = df[df['Category'].isin(selected_categories)]
+    # Sidebar state that feeds the cached pipeline stages
+    stores, categories, period_key = selection(
+        selected_stores if 'selected_stores' in locals() else None,
+        selected_categories if 'selected_categories' in locals() else None,
+        period if period_type == "Predefined Periods" else (start_date, end_date)
+    )
+    # View Mode narrows the stores through the dataset's lifecycle index
+    stores = view_stage(dataset, stores, period_key, analysis_type, calendar, n_years)
     
-    # Apply date filters
-    if period_type == "Custom Date Range":
-        df = df[(df['Date'] >= pd.to_datetime(start_date)) & (df['Date'] <= pd.to_datetime(end_date))]
-    else:
-        # Implement predefined periods
-        today = df['Date'].max()
-        if period == "Christmas (20-25 Dec)":
-            df = df[(df['Date'].dt.month == 12) & (df['Date'].dt.day >= 20) & (df['Date'].dt.day <= 25)]
-        elif period == "December Full Month":
-            df = df[df['Date'].dt.month == 12]
-        elif period == "January MTD":
-            df = df[(df['Date'].dt.month == 1) & (df['Date'] <= today)]
-        elif period == "Last 7 Days":
-            df = df[df['Date'] >= (today - timedelta(days=7))]
-        elif period == "Last 30 Days":
-            df = df[df['Date'] >= (today - timedelta(days=30))]
-        elif period == "Last Quarter":
-            df = df[df['Date'] >= (today - timedelta(days=90))]
+    df = filter_stage(dataset, stores, categories, period_key, calendar, n_years)
+    df_cy, current_year, last_year = split_stage(dataset, stores, categories, period_key, calendar, n_years)
     
     # Title
     st.title("📊 Sales Performance Dashboard")
     period_text = period if period_type == "Predefined Periods" else f"Custom: {start_date} to {end_date}"
-    st.markdown(f"**{analysis_type}** | **{period_text}** — YOY Review")
+    st.markdown(f"**{analysis_type}** | **{period_text}** | LY: {calendar} — YOY Review")
     
-    # Calculate KPIs
-    current_year = df['Date'].dt.year.max()
-    last_year = current_year - 1
+    if not len(df):
+        st.warning("⚠️ No sales for the selected view, period and filters")
+        perf.end()
+        poll_pending_load()
+        st.stop()
     
-    df_cy = df[df['Date'].dt.year == current_year]
-    df_ly = df[df['Date'].dt.year == last_year]
+    # Single (Store, Category, Year) cube feeding the KPIs and every tab;
+    # the cards paint before the heavier per-tab tables are built
+    cube = cube_stage(dataset, stores, categories, period_key, calendar, n_years)
     
-    sales_cy = df_cy['Sales'].sum()
-    sales_ly = df_ly['Sales'].sum()
+    # Calculate KPIs
+    year_sales = cube.groupby('Year')['Sales'].sum()
+    sales_cy = year_sales.get(current_year, 0)
+    sales_ly = year_sales.get(last_year, 0)
     net_yoy = sales_cy - sales_ly
     yoy_percent = ((sales_cy - sales_ly) / sales_ly * 100) if sales_ly > 0 else 0
     
@@ -310,39 +364,39 @@ if st.session_state.data is not None:
             delta=f"{yoy_percent:.1f}%"
         )
     
+    # Multi-year view, read from the same cube
+    if n_years > 2:
+        first_year = current_year - n_years + 1
+        year_cols = st.columns(n_years + 1)
+        for col, year in zip(year_cols, range(first_year, current_year + 1)):
+            with col:
+                sales = year_sales.get(year, 0)
+                st.metric(
+                    label=f"📆 Sales {year}",
+                    value=f"₹{sales:,.0f}",
+                    delta=f"{float(yoy_pct(sales, year_sales.get(year - 1, 0))):.1f}%" if year > first_year else None
+                )
+        with year_cols[-1]:
+            growth = float(cagr(year_sales.get(first_year, 0), sales_cy, n_years - 1))
+            st.metric(
+                label=f"📈 CAGR {first_year}–{current_year}",
+                value=f"{growth:.1f}%"
+            )
+    
     st.divider()
     
-    # Tabs for different sections
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-        "🏪 Store Performance",
-        "📦 Category Analysis",
-        "📈 Trends & Forecasting",
-        "🗺️ Geographic View",
-        "⚠️ Alerts & Insights",
-        "📊 Comparative Analysis"
-    ])
+    aggregates = aggregate_stage(dataset, stores, categories, period_key, calendar, n_years)
+    
+    # Store-level YOY, shared by several tabs
+    store_df = aggregates['store_df']
+    
+    # Tabs for different sections; only the active one is built on a rerun
     
     # Tab 1: Store Performance
-    with tab1:
-        st.header("Store Performance Analysis")
-        
-        # Calculate store-level YOY
-        store_performance = []
-        for store in df['Store'].unique():
-            store_cy = df_cy[df_cy['Store'] == store]['Sales'].sum()
-            store_ly = df_ly[df_ly['Store'] == store]['Sales'].sum()
-            store_yoy = ((store_cy - store_ly) / store_ly * 100) if store_ly > 0 else 0
-            
-            store_performance.append({
-                'Store': store,
-                'Sales_CY': store_cy,
-                'Sales_LY': store_ly,
-                'YOY_%': store_yoy,
-                'YOY_Positive': store_yoy >= 0
-            })
+    def render_store_performance():
+        import plotly.graph_objects as go
         
-        store_df = pd.DataFrame(store_performance)
-        store_df = store_df.sort_values('YOY_%', ascending=True)
+        st.header("Store Performance Analysis")
         
         # Store performance bar chart
         fig_stores = go.Figure()
@@ -369,21 +423,34 @@ if st.session_state.data is not None:
             xaxis=dict(zeroline=True, zerolinecolor='white', zerolinewidth=2)
         )
         
-        st.plotly_chart(fig_stores, use_container_width=True)
+        perf.plotly_chart(fig_stores, use_container_width=True)
         
         # Store details table
         st.subheader("📋 Store Details")
         
-        store_display = store_df.copy()
-        store_display['Sales_CY'] = store_display['Sales_CY'].apply(lambda x: f"₹{x:,.0f}")
-        store_display['Sales_LY'] = store_display['Sales_LY'].apply(lambda x: f"₹{x:,.0f}")
-        store_display['YOY_%'] = store_display['YOY_%'].apply(lambda x: f"{x:.1f}%")
-        store_display = store_display.drop('YOY_Positive', axis=1)
+        store_display = pd.DataFrame({
+            'Store': store_df['Store'],
+            'Sales_CY': store_df['Sales_CY'].map(lambda x: f"₹{x:,.0f}"),
+            'Sales_LY': store_df['Sales_LY'].map(lambda x: f"₹{x:,.0f}"),
+            'YOY_%': store_df['YOY_%'].map(lambda x: f"{x:.1f}%")
+        })
         
         st.dataframe(store_display, use_container_width=True, hide_index=True)
+        
+        if n_years > 2:
+            st.subheader(f"📆 Store Sales over {n_years} Years")
+            year_df = aggregates['year_df']
+            year_display = year_df[['Store']].copy()
+            for col in year_df.columns[1:-1]:
+                year_display[col] = year_df[col].map(lambda x: f"₹{x:,.0f}")
+            year_display['CAGR_%'] = year_df['CAGR_%'].map(lambda x: f"{x:.1f}%")
+            st.dataframe(year_display, use_container_width=True, hide_index=True)
     
     # Tab 2: Category Analysis
-    with tab2:
+    def render_category_analysis():
+        import plotly.express as px
+        import plotly.graph_objects as go
+        
         st.header("Category Performance Analysis")
         
         if 'Category' in df.columns:
@@ -391,7 +458,7 @@ if st.session_state.data is not None:
             col1, col2 = st.columns(2)
             
             with col1:
-                category_sales = df_cy.groupby('Category')['Sales'].sum().sort_values(ascending=False)
+                category_sales = cube[cube['Year'] == current_year].groupby('Category', observed=True)['Sales'].sum().sort_values(ascending=False)
                 
                 fig_category_pie = px.pie(
                     values=category_sales.values,
@@ -401,34 +468,23 @@ if st.session_state.data is not None:
                     hole=0.4
                 )
                 fig_category_pie.update_traces(textposition='inside', textinfo='percent+label')
-                st.plotly_chart(fig_category_pie, use_container_width=True)
+                perf.plotly_chart(fig_category_pie, use_container_width=True)
             
             with col2:
                 # Category YOY comparison
-                category_comparison = []
-                for category in df['Category'].unique():
-                    cat_cy = df_cy[df_cy['Category'] == category]['Sales'].sum()
-                    cat_ly = df_ly[df_ly['Category'] == category]['Sales'].sum()
-                    
-                    category_comparison.append({
-                        'Category': category,
-                        f'{current_year}': cat_cy,
-                        f'{last_year}': cat_ly
-                    })
-                
-                cat_comp_df = pd.DataFrame(category_comparison)
+                cat_comp_df = aggregates['category_df']
                 
                 fig_category_bar = go.Figure()
                 fig_category_bar.add_trace(go.Bar(
                     name=str(last_year),
                     x=cat_comp_df['Category'],
-                    y=cat_comp_df[f'{last_year}'],
+                    y=cat_comp_df['Sales_LY'],
                     marker_color='lightblue'
                 ))
                 fig_category_bar.add_trace(go.Bar(
                     name=str(current_year),
                     x=cat_comp_df['Category'],
-                    y=cat_comp_df[f'{current_year}'],
+                    y=cat_comp_df['Sales_CY'],
                     marker_color='darkblue'
                 ))
                 
@@ -441,13 +497,12 @@ if st.session_state.data is not None:
                     height=400
                 )
                 
-                st.plotly_chart(fig_category_bar, use_container_width=True)
+                perf.plotly_chart(fig_category_bar, use_container_width=True)
             
             # Category performance by store - Heatmap
             st.subheader("Category Performance by Store")
             
-            category_store = df_cy.groupby(['Store', 'Category'])['Sales'].sum().reset_index()
-            category_store_pivot = category_store.pivot(index='Store', columns='Category', values='Sales').fillna(0)
+            category_store_pivot = store_category_pivot(cube, current_year)
             
             fig_heatmap = px.imshow(
                 category_store_pivot,
@@ -459,43 +514,35 @@ if st.session_state.data is not None:
             )
             
             fig_heatmap.update_xaxes(side="top")
-            st.plotly_chart(fig_heatmap, use_container_width=True)
+            perf.plotly_chart(fig_heatmap, use_container_width=True)
             
             # Category metrics table
             st.subheader("📊 Category Metrics")
             
-            category_metrics = []
-            for category in df['Category'].unique():
-                cat_cy = df_cy[df_cy['Category'] == category]['Sales'].sum()
-                cat_ly = df_ly[df_ly['Category'] == category]['Sales'].sum()
-                cat_yoy = ((cat_cy - cat_ly) / cat_ly * 100) if cat_ly > 0 else 0
-                
-                if 'Units_Sold' in df.columns:
-                    units = df_cy[df_cy['Category'] == category]['Units_Sold'].sum()
-                else:
-                    units = 0
-                
-                category_metrics.append({
-                    'Category': category,
-                    'Sales (₹)': f"₹{cat_cy:,.0f}",
-                    'YOY %': f"{cat_yoy:.1f}%",
-                    'Units Sold': f"{units:,}"
-                })
+            units = cat_comp_df['Units_Sold'] if 'Units_Sold' in cat_comp_df.columns else pd.Series(0, index=cat_comp_df.index)
+            category_metrics = pd.DataFrame({
+                'Category': cat_comp_df['Category'],
+                'Sales (₹)': cat_comp_df['Sales_CY'].map(lambda x: f"₹{x:,.0f}"),
+                'YOY %': cat_comp_df['YOY_%'].map(lambda x: f"{x:.1f}%"),
+                'Units Sold': units.map(lambda x: f"{x:,}")
+            })
             
-            st.dataframe(pd.DataFrame(category_metrics), use_container_width=True, hide_index=True)
+            st.dataframe(category_metrics, use_container_width=True, hide_index=True)
     
     # Tab 3: Trends & Forecasting
-    with tab3:
+    def render_trends():
+        import plotly.express as px
+        import plotly.graph_objects as go
+        
         st.header("Sales Trends & Forecasting")
         
         # Daily trend
-        daily_sales = df.groupby('Date')['Sales'].sum().reset_index()
-        daily_sales = daily_sales.sort_values('Date')
+        daily_sales = aggregates['daily_sales']
         
         fig_trend = go.Figure()
         
-        # Add CY line
-        daily_cy = daily_sales[daily_sales['Date'].dt.year == current_year]
+        # Add CY line; long traces are cut to about one point per pixel
+        daily_cy = downsample_frame(daily_sales[daily_sales['Year'] == current_year], 'Date', 'Sales')
         fig_trend.add_trace(go.Scatter(
             x=daily_cy['Date'],
             y=daily_cy['Sales'],
@@ -504,18 +551,27 @@ if st.session_state.data is not None:
             line=dict(color='blue', width=2)
         ))
         
-        # Add LY line
-        daily_ly = daily_sales[daily_sales['Date'].dt.year == last_year]
-        daily_ly_copy = daily_ly.copy()
-        daily_ly_copy['Date_Adjusted'] = daily_ly_copy['Date'] + pd.DateOffset(years=1)
+        # Add LY line, already plotted on the CY dates its days are aligned with
+        daily_ly = downsample_frame(daily_sales[daily_sales['Year'] == last_year], 'Date', 'Sales')
         fig_trend.add_trace(go.Scatter(
-            x=daily_ly_copy['Date_Adjusted'],
-            y=daily_ly_copy['Sales'],
+            x=daily_ly['Date'],
+            y=daily_ly['Sales'],
             mode='lines',
             name=f'{last_year}',
             line=dict(color='lightblue', width=2, dash='dash')
         ))
         
+        # Earlier years, when comparing more than two
+        for year in range(last_year - 1, current_year - n_years, -1):
+            daily_year = downsample_frame(daily_sales[daily_sales['Year'] == year], 'Date', 'Sales')
+            fig_trend.add_trace(go.Scatter(
+                x=daily_year['Date'],
+                y=daily_year['Sales'],
+                mode='lines',
+                name=f'{year}',
+                line=dict(width=1, dash='dot')
+            ))
+        
         fig_trend.update_layout(
             title="Daily Sales Trend - Year over Year",
             xaxis_title="Date",
@@ -525,17 +581,14 @@ if st.session_state.data is not None:
             hovermode='x unified'
         )
         
-        st.plotly_chart(fig_trend, use_container_width=True)
+        perf.plotly_chart(fig_trend, use_container_width=True)
         
         # Weekly and Monthly aggregation
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("📅 Weekly Performance")
-            df_weekly = df.copy()
-            df_weekly['Week'] = df_weekly['Date'].dt.to_period('W').astype(str)
-            df_weekly['Year'] = df_weekly['Date'].dt.year
-            weekly_sales = df_weekly.groupby(['Week', 'Year'])['Sales'].sum().reset_index()
+            weekly_sales = rollup_stage(dataset, stores, categories, period_key, 'W', calendar, n_years)
             
             fig_weekly = px.line(
                 weekly_sales,
@@ -548,14 +601,11 @@ if st.session_state.data is not None:
             )
             fig_weekly.update_xaxes(tickangle=45)
             fig_weekly.update_layout(height=350)
-            st.plotly_chart(fig_weekly, use_container_width=True)
+            perf.plotly_chart(fig_weekly, use_container_width=True)
         
         with col2:
             st.subheader("📊 Monthly Performance")
-            df_monthly = df.copy()
-            df_monthly['Month'] = df_monthly['Date'].dt.to_period('M').astype(str)
-            df_monthly['Year'] = df_monthly['Date'].dt.year
-            monthly_sales = df_monthly.groupby(['Month', 'Year'])['Sales'].sum().reset_index()
+            monthly_sales = rollup_stage(dataset, stores, categories, period_key, 'M', calendar, n_years)
             
             fig_monthly = px.bar(
                 monthly_sales,
@@ -568,28 +618,32 @@ if st.session_state.data is not None:
             )
             fig_monthly.update_xaxes(tickangle=45)
             fig_monthly.update_layout(height=350)
-            st.plotly_chart(fig_monthly, use_container_width=True)
+            perf.plotly_chart(fig_monthly, use_container_width=True)
         
-        # Simple Forecasting
+        # Forecasting
         st.subheader("🔮 Sales Forecast (Next 30 Days)")
         
+        forecast_model = st.selectbox(
+            "Forecast model",
+            FORECAST_MODELS,
+            key=remember('forecast_model', FORECAST_MODELS[0], FORECAST_MODELS),
+            help="Fitted per store on the full history of the selected stores and categories"
+        )
+        
         try:
-            forecast_data = df_cy.groupby('Date')['Sales'].sum().sort_index()
+            history = daily_totals(history_stage(dataset, stores, categories))
             
-            if len(forecast_data) > 7:
-                # Simple moving average forecast
-                last_date = forecast_data.index[-1]
-                forecast_dates = pd.date_range(start=last_date + timedelta(days=1), periods=30, freq='D')
-                
-                # Use last 30 days average as forecast
-                forecast_value = forecast_data.tail(30).mean()
-                forecast_values = [forecast_value] * 30
+            if len(history) >= 14:
+                store_forecast = forecast_stage(dataset, stores, categories, forecast_model)
+                total_forecast = store_forecast.groupby('Day')['Forecast'].sum()
+                forecast_dates = to_dates(total_forecast.index)
+                forecast_value = total_forecast.mean()
                 
                 # Plot
                 fig_forecast = go.Figure()
                 
                 # Historical data (last 60 days)
-                historical = forecast_data.tail(60)
+                historical = history.tail(60)
                 fig_forecast.add_trace(go.Scatter(
                     x=historical.index,
                     y=historical.values,
@@ -601,9 +655,9 @@ if st.session_state.data is not None:
                 # Forecast
                 fig_forecast.add_trace(go.Scatter(
                     x=forecast_dates,
-                    y=forecast_values,
+                    y=total_forecast.values,
                     mode='lines',
-                    name='Forecast',
+                    name=f'Forecast ({forecast_model})',
                     line=dict(color='orange', width=2, dash='dash')
                 ))
                 
@@ -616,42 +670,34 @@ if st.session_state.data is not None:
                     hovermode='x unified'
                 )
                 
-                st.plotly_chart(fig_forecast, use_container_width=True)
+                perf.plotly_chart(fig_forecast, use_container_width=True)
                 
                 st.info(f"📊 Forecasted average daily sales: ₹{forecast_value:,.0f}")
+                
+                with st.expander("🏪 Forecast by Store"):
+                    by_store = store_forecast.groupby('Store', sort=False)['Forecast'].agg(['sum', 'mean'])
+                    by_store = by_store.sort_values('sum', ascending=False)
+                    st.dataframe(pd.DataFrame({
+                        'Store': by_store.index,
+                        'Next 30 Days (₹)': by_store['sum'].map(lambda x: f"₹{x:,.0f}").to_numpy(),
+                        'Avg Daily (₹)': by_store['mean'].map(lambda x: f"₹{x:,.0f}").to_numpy()
+                    }), use_container_width=True, hide_index=True)
             else:
-                st.warning("⚠️ Insufficient data for forecasting. Need at least 7 days of data.")
+                st.warning("⚠️ Insufficient data for forecasting. Need at least 14 days of data.")
         except Exception as e:
             st.error(f"Error generating forecast: {e}")
     
     # Tab 4: Geographic View
-    with tab4:
+    def render_geographic():
+        import plotly.express as px
+        
         st.header("Geographic Performance View")
         
         if 'Latitude' in df.columns and 'Longitude' in df.columns:
-            # Store location map with performance
-            store_geo = []
-            for store in df['Store'].unique():
-                store_data = df_cy[df_cy['Store'] == store]
-                if len(store_data) > 0:
-                    sales = store_data['Sales'].sum()
-                    lat = store_data['Latitude'].iloc[0]
-                    lon = store_data['Longitude'].iloc[0]
-                    
-                    # Calculate YOY
-                    store_ly_sales = df_ly[df_ly['Store'] == store]['Sales'].sum()
-                    yoy = ((sales - store_ly_sales) / store_ly_sales * 100) if store_ly_sales > 0 else 0
-                    
-                    store_geo.append({
-                        'Store': store,
-                        'Latitude': lat,
-                        'Longitude': lon,
-                        'Sales': sales,
-                        'YOY_%': yoy,
-                        'Size': sales / 10000
-                    })
-            
-            geo_df = pd.DataFrame(store_geo)
+            # Store location map with performance (stores trading this year)
+            geo_df = store_df.join(store_locations(df_cy), on='Store', how='inner')
+            geo_df = geo_df.rename(columns={'Sales_CY': 'Sales'})
+            geo_df['Size'] = geo_df['Sales'] / 10000
             
             fig_map = px.scatter_mapbox(
                 geo_df,
@@ -679,7 +725,7 @@ if st.session_state.data is not None:
                 template="plotly_dark"
             )
             
-            st.plotly_chart(fig_map, use_container_width=True)
+            perf.plotly_chart(fig_map, use_container_width=True)
             
             st.info("🗺️ Marker size represents sales volume. Color represents YOY performance (Red: Decline, Green: Growth)")
         else:
@@ -687,7 +733,7 @@ if st.session_state.data is not None:
             st.info("💡 Add 'Latitude' and 'Longitude' columns to your data to see geographic visualization")
     
     # Tab 5: Alerts & Insights
-    with tab5:
+    def render_alerts():
         st.header("⚠️ Alerts & Business Insights")
         
         # Performance alerts
@@ -708,24 +754,18 @@ if st.session_state.data is not None:
                     
                     # Store-specific category insights
                     if 'Category' in df.columns:
-                        store_data_cy = df_cy[df_cy['Store'] == row['Store']]
-                        store_data_ly = df_ly[df_ly['Store'] == row['Store']]
+                        store_category_df = aggregates['store_category_df']
+                        store_cats = store_category_df[store_category_df['Store'] == row['Store']]
                         
                         st.subheader("Category Performance")
-                        cat_comparison = []
-                        for cat in df['Category'].unique():
-                            cat_cy = store_data_cy[store_data_cy['Category'] == cat]['Sales'].sum()
-                            cat_ly = store_data_ly[store_data_ly['Category'] == cat]['Sales'].sum()
-                            cat_yoy = ((cat_cy - cat_ly) / cat_ly * 100) if cat_ly > 0 else 0
-                            
-                            cat_comparison.append({
-                                'Category': cat,
-                                'CY': f"₹{cat_cy:,.0f}",
-                                'LY': f"₹{cat_ly:,.0f}",
-                                'YOY %': f"{cat_yoy:.1f}%"
-                            })
+                        cat_comparison = pd.DataFrame({
+                            'Category': store_cats['Category'],
+                            'CY': store_cats['Sales_CY'].map(lambda x: f"₹{x:,.0f}"),
+                            'LY': store_cats['Sales_LY'].map(lambda x: f"₹{x:,.0f}"),
+                            'YOY %': store_cats['YOY_%'].map(lambda x: f"{x:.1f}%")
+                        })
                         
-                        st.dataframe(pd.DataFrame(cat_comparison), use_container_width=True, hide_index=True)
+                        st.dataframe(cat_comparison, use_container_width=True, hide_index=True)
         else:
             st.success(f"✅ All stores are performing above the alert threshold of {alert_threshold}%")
         
@@ -764,51 +804,37 @@ if st.session_state.data is not None:
         
         # Category insights
         if 'Category' in df.columns:
-            category_yoy = []
-            for category in df['Category'].unique():
-                cat_cy = df_cy[df_cy['Category'] == category]['Sales'].sum()
-                cat_ly = df_ly[df_ly['Category'] == category]['Sales'].sum()
-                cat_yoy = ((cat_cy - cat_ly) / cat_ly * 100) if cat_ly > 0 else 0
-                category_yoy.append({'Category': category, 'YOY': cat_yoy})
+            category_df = aggregates['category_df']
+            best_category = category_df.loc[category_df['YOY_%'].idxmax()]
+            worst_category = category_df.loc[category_df['YOY_%'].idxmin()]
             
-            cat_yoy_df = pd.DataFrame(category_yoy)
-            best_category = cat_yoy_df.loc[cat_yoy_df['YOY'].idxmax()]
-            worst_category = cat_yoy_df.loc[cat_yoy_df['YOY'].idxmin()]
-            
-            insights.append(f"📦 Best performing category: {best_category['Category']} ({best_category['YOY']:.1f}%)")
-            insights.append(f"📦 Worst performing category: {worst_category['Category']} ({worst_category['YOY']:.1f}%)")
+            insights.append(f"📦 Best performing category: {best_category['Category']} ({best_category['YOY_%']:.1f}%)")
+            insights.append(f"📦 Worst performing category: {worst_category['Category']} ({worst_category['YOY_%']:.1f}%)")
         
         for insight in insights:
             st.info(insight)
     
     # Tab 6: Comparative Analysis
-    with tab6:
+    def render_comparison():
+        import plotly.express as px
+        import plotly.graph_objects as go
+        
         st.header("📊 Comparative Analysis")
         
         # Store comparison selector
         st.subheader("Compare Stores")
         
-        default_stores = list(df['Store'].unique())[:3] if len(df['Store'].unique()) >= 3 else list(df['Store'].unique())
+        store_names = list(store_df['Store'].sort_values())
         compare_stores = st.multiselect(
             "Select stores to compare",
-            options=df['Store'].unique(),
-            default=default_stores
+            options=store_names,
+            key=remember('compare_stores', store_names[:3], store_names)
         )
         
         if len(compare_stores) > 0:
             # Sales comparison
-            comparison_data = []
-            for store in compare_stores:
-                store_cy = df_cy[df_cy['Store'] == store]['Sales'].sum()
-                store_ly = df_ly[df_ly['Store'] == store]['Sales'].sum()
-                
-                comparison_data.append({
-                    'Store': store,
-                    'Current Year': store_cy,
-                    'Last Year': store_ly
-                })
-            
-            comp_df = pd.DataFrame(comparison_data)
+            comp_df = store_df.set_index('Store').reindex(compare_stores, fill_value=0).reset_index()
+            comp_df = comp_df.rename(columns={'Sales_CY': 'Current Year', 'Sales_LY': 'Last Year'})
             
             fig_comparison = go.Figure()
             fig_comparison.add_trace(go.Bar(
@@ -833,12 +859,15 @@ if st.session_state.data is not None:
                 height=400
             )
             
-            st.plotly_chart(fig_comparison, use_container_width=True)
+            perf.plotly_chart(fig_comparison, use_container_width=True)
             
             # Time series comparison
             st.subheader("Sales Trend Comparison")
             
-            trend_comparison = df[df['Store'].isin(compare_stores)].groupby(['Date', 'Store'])['Sales'].sum().reset_index()
+            trend_comparison = group_totals(df[df['Store'].isin(compare_stores)], ['Day', 'Store'])
+            trend_comparison.insert(0, 'Date', to_dates(trend_comparison['Day']))
+            trend_comparison['Store'] = trend_comparison['Store'].astype(str)
+            trend_comparison = downsample_frame(trend_comparison, 'Date', 'Sales', by='Store')
             
             fig_trend_comp = px.line(
                 trend_comparison,
@@ -850,13 +879,15 @@ if st.session_state.data is not None:
                 height=400
             )
             
-            st.plotly_chart(fig_trend_comp, use_container_width=True)
+            perf.plotly_chart(fig_trend_comp, use_container_width=True)
             
             # Category performance comparison
             if 'Category' in df.columns:
                 st.subheader("Category Performance Comparison")
                 
-                cat_store_comp = df_cy[df_cy['Store'].isin(compare_stores)].groupby(['Store', 'Category'])['Sales'].sum().reset_index()
+                cube_cy = cube[cube['Year'] == current_year]
+                cat_store_comp = cube_cy[cube_cy['Store'].isin(compare_stores)].groupby(['Store', 'Category'], observed=True)['Sales'].sum().reset_index()
+                cat_store_comp = cat_store_comp.astype({'Store': str, 'Category': str})
                 
                 fig_cat_comp = px.bar(
                     cat_store_comp,
@@ -869,10 +900,78 @@ if st.session_state.data is not None:
                     height=400
                 )
                 
-                st.plotly_chart(fig_cat_comp, use_container_width=True)
+                perf.plotly_chart(fig_cat_comp, use_container_width=True)
         else:
             st.info("👆 Select stores to compare their performance")
 
+    lazy_tabs({
+        "🏪 Store Performance": render_store_performance,
+        "📦 Category Analysis": render_category_analysis,
+        "📈 Trends & Forecasting": render_trends,
+        "🗺️ Geographic View": render_geographic,
+        "⚠️ Alerts & Insights": render_alerts,
+        "📊 Comparative Analysis": render_comparison
+    }, key='active_tab')
+
+    # Export Options; files are only built when requested
+    with st.sidebar:
+        st.divider()
+        st.header("💾 Export Options")
+        
+        export_what = st.selectbox("Export", EXPORTS)
+        export_format = st.radio("Format", list(EXPORT_FORMATS), horizontal=True)
+        export_key = (dataset.key, stores, categories, period_key, calendar, n_years, export_what, export_format)
+        
+        if st.button("📥 Prepare Export"):
+            with st.spinner("Building export..."), perf.stage('export'):
+                if export_what == "Sales rows":
+                    # A database-backed dataset exports the selected rows, not the whole table
+                    export_df = with_dates(dataset.frame if isinstance(dataset, SalesDataset) else df)
+                elif export_what == "Store YOY":
+                    export_df = aggregates['store_df']
+                elif export_what == "Category cube":
+                    export_df = cube
+                else:
+                    export_df = store_verdicts(df, current_year, last_year)
+                data, extension, mime = export_bytes(export_df, export_format, sheet_name=export_what)
+                name = export_what.lower().replace(' ', '_')
+                st.session_state.export = (
+                    export_key, data, f"{name}_{datetime.now().strftime('%Y%m%d')}.{extension}", mime
+                )
+        
+        # The prepared file is kept until the selection or export choice changes
+        prepared = st.session_state.get('export')
+        if prepared is not None and prepared[0] == export_key:
+            _, data, file_name, mime = prepared
+            st.download_button(
+                label="Click to Download",
+                data=data,
+                file_name=file_name,
+                mime=mime
+            )
+        elif prepared is not None:
+            st.session_state.export = None
+
+    # Memory held by this session's dataset and current view
+    with st.sidebar:
+        with st.expander("🧠 Memory Usage"):
+            if isinstance(dataset, SalesDataset):
+                held = {
+                    'Raw rows': dataset.frame,
+                    'Daily table': dataset.daily,
+                    'Weekly/monthly rollups': [dataset.weekly, dataset.monthly],
+                    'Store/Category/Year cube': dataset.cube,
+                    'Day index': dataset.days,
+                }
+            else:
+                held = {'Lifecycle index': dataset.lifecycle}
+            report = memory_report({**held, 'Filtered view': df, 'Aggregates': aggregates})
+            st.dataframe(report, use_container_width=True, hide_index=True,
+                         column_config={'MB': st.column_config.NumberColumn(format="%.2f")})
+            st.caption(f"Total: {report['MB'].sum():.2f} MB")
+            st.caption("Datasets shared across sessions")
+            st.dataframe(registry.stats(), use_container_width=True, hide_index=True)
+
 else:
     # Welcome screen
     st.title("📊 Sales Performance Dashboard")
@@ -922,3 +1021,8 @@ else:
     """)
     
     st.info("👈 **Get started by uploading your data or using sample data from the sidebar!**")
+
+perf.end()
+
+# Poll an upload still loading in the background once the page has painted
+poll_pending_load()
@@ -0,0 +1,245 @@
+"""Christmas YOY execution stress test pipeline, shared by app.py and the CLI.
+
+Runs headless over one or many workbooks and writes the action table:
+
+    python stress_test.py "YOY COMPARISION OF STORES & HO.xlsx" -o actions.parquet
+    python stress_test.py exports/ "regions/*.xlsx" -o actions.csv --workers 8
+
+Nothing here imports Streamlit or Plotly, so batch jobs start quickly.
+"""
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from file_cache import read_table
+from schema import day_numbers, to_dates
+from verdicts import SPIKE_THRESHOLD, classify, execution_metrics
+
+LAST_YEAR = 2024
+CURRENT_YEAR = 2025
+
+WORKBOOK_SUFFIXES = ('.xlsx', '.xls', '.csv')
+
+HEATMAP_ORDERS = ["Cluster", "Net YOY", "Store"]
+
+ACTION_COLUMNS = {
+    "Store": "Store",
+    "Sales_LY_Total": "Sales LY",
+    "Sales_CY_Total": "Sales CY",
+    "YOY_Delta": "YOY Δ",
+    "YOY_Pct": "YOY %",
+    "YOY_Spike_Index": "YOY Spike Index",
+    "Qty_YOY_Pct": "Qty YOY %",
+    "Execution_Verdict": "Execution Verdict"
+}
+
+
+# -----------------------------
+# SANITY CHECKS
+# -----------------------------
+def required_columns(last_year=LAST_YEAR, current_year=CURRENT_YEAR):
+    return [
+        "Site", "Date",
+        f"Net Sale Qty - {last_year}", f"Net Sale Amount - {last_year}",
+        f"Net Sale Qty - {current_year}", f"Net Sale Amount - {current_year}"
+    ]
+
+
+def clean_headers(df):
+    """Collapse line breaks and repeated spaces in headers ("Net Sale Qty\\n - 2024")"""
+    return df.rename(columns=lambda c: " ".join(str(c).split()))
+
+
+def missing_columns(df, last_year=LAST_YEAR, current_year=CURRENT_YEAR):
+    return [c for c in required_columns(last_year, current_year) if c not in df.columns]
+
+
+# -----------------------------
+# PIPELINE
+# -----------------------------
+def normalize(df, last_year=LAST_YEAR, current_year=CURRENT_YEAR):
+    """Rename to the LY/CY schema and add the daily YOY differences"""
+    df = df.rename(columns={
+        "Site": "Store",
+        f"Net Sale Qty - {last_year}": "Qty_LY",
+        f"Net Sale Amount - {last_year}": "Sales_LY",
+        f"Net Sale Qty - {current_year}": "Qty_CY",
+        f"Net Sale Amount - {current_year}": "Sales_CY"
+    })
+
+    df["Date"] = pd.to_datetime(df["Date"])
+
+    df["Daily_YOY"] = df["Sales_CY"] - df["Sales_LY"]
+    df["Qty_YOY"] = df["Qty_CY"] - df["Qty_LY"]
+    return df
+
+
+def store_aggregates(df, spike_threshold=SPIKE_THRESHOLD):
+    """Per-store totals, spike index, volatility and execution verdict"""
+    store_agg = execution_metrics(df, by=["Store"])
+    store_agg["Execution_Verdict"] = classify(store_agg, spike_threshold=spike_threshold)
+    return store_agg
+
+
+def daily_yoy_matrix(df):
+    """(matrix, stores, days): Daily_YOY summed per store and day.
+
+    Stores and dates become integer codes and the matrix is filled with one
+    bincount over ``store * n_days + day``; cells with no rows are NaN.
+    Days are the day numbers present, in date order.
+    """
+    store_codes, stores = pd.factorize(df["Store"], sort=True)
+    days, day_index = np.unique(day_numbers(df["Date"]), return_inverse=True)
+    cells = len(stores) * len(days)
+    flat = store_codes * len(days) + day_index
+    values = np.nan_to_num(df["Daily_YOY"].to_numpy(dtype=np.float64))
+    sums = np.bincount(flat, weights=values, minlength=cells)
+    counts = np.bincount(flat, minlength=cells)
+    matrix = np.where(counts > 0, sums, np.nan).reshape(len(stores), len(days))
+    return matrix, np.asarray(stores), days
+
+
+def store_order(matrix, order="Cluster"):
+    """Row order for the heatmap.
+
+    ``Cluster`` sorts stores along the leading principal component of their
+    daily pattern, so stores that moved alike sit together; ``Net YOY`` puts
+    the biggest gains first; ``Store`` keeps the name order.
+    """
+    if order == "Store" or len(matrix) < 3:
+        return np.arange(len(matrix))
+    filled = np.nan_to_num(matrix)
+    if order == "Net YOY":
+        return np.argsort(-filled.sum(axis=1), kind="stable")
+    if order != "Cluster":
+        raise ValueError(f"Unknown store order: {order}")
+    # Compare shapes, not sizes: centre and scale each store's row
+    centred = filled - filled.mean(axis=1, keepdims=True)
+    scale = np.linalg.norm(centred, axis=1, keepdims=True)
+    shapes = np.divide(centred, scale, out=np.zeros_like(centred), where=scale > 0)
+    _, _, vt = np.linalg.svd(shapes - shapes.mean(axis=0), full_matrices=False)
+    return np.argsort(shapes @ vt[0], kind="stable")
+
+
+def daily_yoy_heatmap(df, order="Store", top=None, tile=None):
+    """Store x day matrix of Daily_YOY for the consistency heatmap.
+
+    Columns are in date order. With ``top`` only that many stores with the
+    largest net YOY swing (either way) are kept; with ``tile`` as well, the
+    ordered stores are cut into tiles of ``top`` rows and that tile is
+    returned instead, so the figure stays the same size for any store count.
+    """
+    matrix, stores, days = daily_yoy_matrix(df)
+    if top is not None and tile is None:
+        swing = np.abs(np.nan_to_num(matrix).sum(axis=1))
+        keep = np.sort(np.argsort(-swing, kind="stable")[:top])
+        matrix, stores = matrix[keep], stores[keep]
+    rows = store_order(matrix, order)
+    if top is not None and tile is not None:
+        rows = rows[tile * top:(tile + 1) * top]
+
+    dates = to_dates(days)
+    fmt = "%d-%b" if dates.year.nunique() <= 1 else "%d-%b-%y"
+    return pd.DataFrame(
+        matrix[rows],
+        index=pd.Index(stores[rows], name="Store"),
+        columns=pd.Index(dates.strftime(fmt), name="Date"),
+    )
+
+
+def action_table(store_agg):
+    """The store action table with display column names"""
+    return store_agg[list(ACTION_COLUMNS)].rename(columns=ACTION_COLUMNS)
+
+
+def run(path, spike_threshold=SPIKE_THRESHOLD, last_year=LAST_YEAR, current_year=CURRENT_YEAR):
+    """Action table for one workbook; raises ValueError if columns are missing"""
+    df = clean_headers(read_table(path))
+    missing = missing_columns(df, last_year, current_year)
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    df = normalize(df, last_year, current_year)
+    table = action_table(store_aggregates(df, spike_threshold))
+    table.insert(0, "Source", os.path.basename(path))
+    return table
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def expand_paths(patterns):
+    """Workbook paths for a mix of files, directories and glob patterns"""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(
+                entry.path for entry in os.scandir(pattern)
+                if entry.is_file() and entry.name.lower().endswith(WORKBOOK_SUFFIXES)
+            )
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
+        else:
+            matches = [pattern]
+        paths.extend(p for p in matches if p not in paths)
+    return paths
+
+
+def write_table(table, output):
+    if output.lower().endswith('.parquet'):
+        table.to_parquet(output, index=False)
+    else:
+        table.to_csv(output, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Christmas YOY execution stress test over one or many workbooks")
+    parser.add_argument("paths", nargs="+", help="Workbooks, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="action_table.parquet",
+                        help="Output file; .parquet or .csv (default: action_table.parquet)")
+    parser.add_argument("--spike-threshold", type=float, default=SPIKE_THRESHOLD,
+                        help=f"YOY spike index above which an improvement counts as forced (default: {SPIKE_THRESHOLD})")
+    parser.add_argument("--years", nargs=2, type=int, default=[LAST_YEAR, CURRENT_YEAR], metavar=("LY", "CY"),
+                        help=f"Years compared in the workbook columns (default: {LAST_YEAR} {CURRENT_YEAR})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    paths = expand_paths(args.paths)
+    if not paths:
+        parser.error("no workbooks matched")
+
+    job_args = (args.spike_threshold, *args.years)
+    tables, failed = [], 0
+    if args.workers <= 1 or len(paths) == 1:
+        results = []
+        for path in paths:
+            try:
+                results.append((path, run(path, *job_args), None))
+            except Exception as e:
+                results.append((path, None, e))
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(paths))) as pool:
+            futures = [(path, pool.submit(run, path, *job_args)) for path in paths]
+            results = [(path, future.result(), None) if future.exception() is None
+                       else (path, None, future.exception()) for path, future in futures]
+
+    for path, table, error in results:
+        if error is not None:
+            failed += 1
+            print(f"{path}: {error}", file=sys.stderr)
+        else:
+            tables.append(table)
+
+    if tables:
+        write_table(pd.concat(tables, ignore_index=True), args.output)
+        print(f"Wrote {sum(len(t) for t in tables)} stores from {len(tables)} workbook(s) to {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Store lifecycle classification for View Mode filtering"""
+import pandas as pd
+
+import pipeline
+from dataset import SalesDataset
+
+LFL = "YOY – Like-to-Like Stores (LFL)"
+
+
+def sales(stores, start, end, closed=()):
+    """One row per store and day from ``start`` to ``end``, with zero sales on ``closed`` dates"""
+    rows = []
+    for store, (first, last) in stores.items():
+        for date in pd.date_range(max(start, first), min(end, last)):
+            amount = 0.0 if date.strftime('%m-%d') in closed else 1000.0
+            rows.append({'Date': date, 'Store': store, 'Category': 'Shirts', 'Sales': amount, 'Units_Sold': 1})
+    return SalesDataset.from_frame(pd.DataFrame(rows), key=f"lifecycle-test-{id(rows)}")
+
+
+def view(dataset, period, mode=LFL):
+    return pipeline.view_stage(dataset, None, period, mode)
+
+
+def test_christmas_day_closure_keeps_stores_lfl():
+    # Every store shuts on Christmas Day, which is also the last day of the data
+    stores = {'A': ('2023-01-01', '2024-12-25'), 'B': ('2023-01-01', '2024-12-25')}
+    dataset = sales(stores, '2023-01-01', '2024-12-25', closed=('12-25',))
+    for period in ("Christmas (20-25 Dec)", "Last 7 Days"):
+        assert view(dataset, period) == ('A', 'B')
+        assert view(dataset, period, "Closed Stores") == ()
+
+
+def test_zero_sale_last_days_keep_store_lfl():
+    # A stops trading a day before the data ends; B trades to the end
+    stores = {'A': ('2023-01-01', '2024-12-30'), 'B': ('2023-01-01', '2024-12-31')}
+    dataset = sales(stores, '2023-01-01', '2024-12-31')
+    for period in ("December Full Month", "Last 7 Days"):
+        assert view(dataset, period) == ('A', 'B')
+        assert view(dataset, period, "Closed Stores") == ()
+
+
+def test_new_and_closed_stores():
+    stores = {
+        'LFL': ('2023-01-01', '2024-12-31'),
+        'NEW': ('2024-06-01', '2024-12-31'),
+        'CLOSED': ('2023-01-01', '2024-03-31'),
+    }
+    dataset = sales(stores, '2023-01-01', '2024-12-31')
+    period = "December Full Month"
+    assert view(dataset, period) == ('LFL',)
+    assert view(dataset, period, "New Stores") == ('NEW',)
+    assert view(dataset, period, "Closed Stores") == ('CLOSED',)
+    assert view(dataset, period, "YOY of HO") is None
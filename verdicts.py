@@ -0,0 +1,123 @@
+"""Execution verdicts for store YOY aggregates as a declarative rule table.
+
+Each rule is a verdict label and the conditions that must all hold for it;
+the first matching rule wins, as in an if/elif chain. Rules are evaluated
+column-wise with ``np.select``, so classifying every store x week of the
+year costs a handful of array comparisons rather than a Python call per row.
+"""
+import operator
+
+import numpy as np
+import pandas as pd
+
+from aggregation import group_totals
+
+SPIKE_THRESHOLD = 1.8
+
+# (verdict, [(column, op, value), ...]); a string value names a threshold
+RULES = [
+    ("DECLINED", [("YOY_Pct", "<", 0)]),
+    ("IMPROVED – FORCED", [("YOY_Spike_Index", ">", "spike_threshold")]),
+    ("IMPROVED – CONTROLLED", [("YOY_Pct", ">", 0), ("Qty_YOY_Pct", ">=", 0)]),
+    ("PRICE-DRIVEN RISK", [("YOY_Pct", ">", 0), ("Qty_YOY_Pct", "<", 0)]),
+]
+DEFAULT_VERDICT = "UNCLASSIFIED"
+
+_OPS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+def _ratio(num, den, valid):
+    """num / den where ``valid``, NaN elsewhere, without divide warnings"""
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    out = np.full(num.shape, np.nan)
+    np.divide(num, den, out=out, where=valid)
+    return out
+
+
+def execution_metrics(df, by=("Store",)):
+    """Per-group LY/CY totals, YOY %, spike index and volatility.
+
+    ``df`` holds the normalised daily rows (Sales_LY/CY, Qty_LY/CY and
+    Daily_YOY); ``by`` is Store alone for the Christmas window, or e.g.
+    Store and Week to score every week of the year in one pass.
+    """
+    agg = df.groupby(list(by), observed=True).agg(
+        Sales_LY_Total=("Sales_LY", "sum"),
+        Sales_CY_Total=("Sales_CY", "sum"),
+        Qty_LY_Total=("Qty_LY", "sum"),
+        Qty_CY_Total=("Qty_CY", "sum"),
+        Max_Daily_YOY=("Daily_YOY", "max"),
+        Min_Daily_YOY=("Daily_YOY", "min"),
+        Avg_Daily_YOY=("Daily_YOY", "mean"),
+        Std_Daily_YOY=("Daily_YOY", "std")
+    ).reset_index()
+
+    sales_ly = agg["Sales_LY_Total"].to_numpy(dtype=float)
+    qty_ly = agg["Qty_LY_Total"].to_numpy(dtype=float)
+    avg = agg["Avg_Daily_YOY"].to_numpy(dtype=float)
+
+    agg["YOY_Delta"] = agg["Sales_CY_Total"] - agg["Sales_LY_Total"]
+    agg["YOY_Pct"] = np.nan_to_num(_ratio(agg["YOY_Delta"], sales_ly, sales_ly != 0))
+    agg["Qty_YOY_Pct"] = np.nan_to_num(
+        _ratio(agg["Qty_CY_Total"] - agg["Qty_LY_Total"], qty_ly, qty_ly != 0)
+    )
+    agg["YOY_Spike_Index"] = _ratio(agg["Max_Daily_YOY"], avg, avg > 0)
+    agg["YOY_Volatility"] = _ratio(agg["Std_Daily_YOY"], np.abs(avg), avg != 0)
+    return agg
+
+
+def daily_yoy(daily, current_year, last_year):
+    """Store x day rows with LY and CY sales and units side by side.
+
+    Built from the dashboard's aligned daily rows, whose Year is the
+    comparison year and Aligned_Day the CY day each row is compared on, so
+    LY rows meet their CY days in a merge on integer keys.
+    """
+    years = daily['Year'].to_numpy()
+    keys = ['Store', 'Aligned_Day']
+    merged = group_totals(daily[years == current_year], keys).merge(
+        group_totals(daily[years == last_year], keys), on=keys, how='outer', suffixes=('_CY', '_LY')
+    )
+    merged = merged.rename(columns={
+        'Aligned_Day': 'Day', 'Units_Sold_CY': 'Qty_CY', 'Units_Sold_LY': 'Qty_LY'
+    })
+    for col in ('Sales_CY', 'Sales_LY', 'Qty_CY', 'Qty_LY'):
+        merged[col] = merged[col].fillna(0) if col in merged.columns else 0
+    merged['Daily_YOY'] = merged['Sales_CY'] - merged['Sales_LY']
+    return merged
+
+
+def store_verdicts(daily, current_year, last_year, spike_threshold=SPIKE_THRESHOLD):
+    """Execution metrics and verdict per store for the dashboard's daily rows"""
+    table = execution_metrics(daily_yoy(daily, current_year, last_year), by=["Store"])
+    table["Execution_Verdict"] = classify(table, spike_threshold=spike_threshold)
+    return table
+
+
+def classify(table, rules=RULES, default=DEFAULT_VERDICT, spike_threshold=SPIKE_THRESHOLD):
+    """Verdict for every row of ``table`` as a categorical Series.
+
+    Comparisons against NaN are false, so a store without a spike index
+    falls through to the later rules.
+    """
+    thresholds = {"spike_threshold": spike_threshold}
+    conditions = []
+    for _, clauses in rules:
+        mask = np.ones(len(table), dtype=bool)
+        for column, op, value in clauses:
+            if isinstance(value, str):
+                value = thresholds[value]
+            mask &= _OPS[op](table[column].to_numpy(dtype=float), value)
+        conditions.append(mask)
+
+    labels = [label for label, _ in rules] + [default]
+    codes = np.select(conditions, np.arange(len(rules)), default=len(rules))
+    return pd.Series(pd.Categorical.from_codes(codes, labels), index=table.index, name="Execution_Verdict")
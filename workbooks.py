@@ -0,0 +1,223 @@
+"""Load many LY/CY workbooks at once into one long, date-partitioned dataset.
+
+Exports arrive as one workbook per period ("DEC 2024-2025.xlsx", "JAN 2025-2026
+MTD.xlsx", ...), with a sheet per view and wide "Net Sale Qty/Amount - <year>"
+columns. Every (workbook, sheet) is parsed in a worker process and its year
+columns are unpivoted to one row per Date, Store and Year:
+
+    python workbooks.py "*.xlsx" -o sales_dataset
+    python workbooks.py exports/ -o sales_dataset --workers 8
+
+The dataset is a Parquet directory partitioned by month. Both dashboards read
+it when ``SALES_DATASET`` points at it.
+
+Workbooks date LY figures by the CY day they are compared on, so a row's
+date is moved into each column's year. Rows keyed by Month rather than Date
+are dated the first of the month and get Grain "Month", so monthly totals
+are never summed with daily rows.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from stress_test import clean_headers, expand_paths
+
+DATASET_PATH = os.environ.get("SALES_DATASET")
+LFL_SHEET = "YOY – Like-to-Like Stores (LFL)"
+
+COLUMNS = ["Date", "Store", "Year", "Sales", "Units_Sold", "Grain", "Sheet", "Source"]
+KEYS = ["Date", "Store", "Grain", "Sheet"]
+
+_YEAR_COLUMN = re.compile(r"^Net Sale (Qty|Amount) - (\d{4})$")
+_MEASURES = {"Qty": "Units_Sold", "Amount": "Sales"}
+
+
+# -----------------------------
+# HARMONIZE
+# -----------------------------
+def year_columns(df):
+    """{year: {"Sales": column, "Units_Sold": column}} for the wide year columns"""
+    years = {}
+    for column in df.columns:
+        match = _YEAR_COLUMN.match(column)
+        if match:
+            years.setdefault(int(match.group(2)), {})[_MEASURES[match.group(1)]] = column
+    return years
+
+
+def _in_year(dates, years):
+    """Each date moved into the matching year (29 Feb becomes 28 Feb)"""
+    shifts = years - dates.dt.year.to_numpy()
+    out = dates.copy()
+    for shift in pd.unique(shifts[~np.isnan(shifts)]):
+        if shift:
+            mask = shifts == shift
+            out[mask] = dates[mask] + pd.DateOffset(years=int(shift))
+    return out
+
+
+def harmonize(df, source="", sheet=""):
+    """Long (Date, Store, Year, Sales, Units_Sold, Grain, Sheet, Source) rows of a wide sheet"""
+    df = clean_headers(df)
+    years = year_columns(df)
+    if "Site" not in df.columns or not years or ("Date" not in df.columns and "Month" not in df.columns):
+        return pd.DataFrame(columns=COLUMNS)
+
+    frames = []
+    for year, measures in sorted(years.items()):
+        part = pd.DataFrame({
+            "Store": df["Site"].astype(str).str.strip(),
+            "Year": year,
+            "Sales": pd.to_numeric(df[measures["Sales"]], errors="coerce") if "Sales" in measures else float("nan"),
+            "Units_Sold": pd.to_numeric(df[measures["Units_Sold"]], errors="coerce") if "Units_Sold" in measures else float("nan"),
+        })
+        if "Date" in df.columns:
+            dates = pd.to_datetime(df["Date"], errors="coerce")
+            part.insert(0, "Date", _in_year(dates, part["Year"].to_numpy()))
+            part["Grain"] = "Day"
+        else:
+            months = pd.to_datetime(df["Month"].astype(str).str.strip(), format="%B", errors="coerce").dt.month
+            parts = pd.DataFrame({"year": part["Year"], "month": months, "day": 1})
+            part.insert(0, "Date", pd.to_datetime(parts, errors="coerce"))
+            part["Grain"] = "Month"
+        frames.append(part)
+
+    long = pd.concat(frames, ignore_index=True)
+    long = long[long["Date"].notna() & (long["Sales"].notna() | long["Units_Sold"].notna())]
+    long["Sheet"] = sheet
+    long["Source"] = source
+    return long[COLUMNS].reset_index(drop=True)
+
+
+# -----------------------------
+# LOAD
+# -----------------------------
+def sheets_of(path):
+    """Sheet names of a workbook; a CSV is a single unnamed sheet"""
+    if path.lower().endswith(".csv"):
+        return [None]
+    with pd.ExcelFile(path) as book:
+        return book.sheet_names
+
+
+def read_sheet(path, sheet):
+    """Harmonized rows of one sheet; runs in a worker process"""
+    if sheet is None:
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_excel(path, sheet_name=sheet)
+    return harmonize(df, source=os.path.basename(path), sheet=sheet or "")
+
+
+def load(patterns, workers=None):
+    """One long frame from every sheet of every workbook matching ``patterns``.
+
+    Sheets are parsed concurrently in a process pool. Where two workbooks
+    carry the same Date, Store, Grain and Sheet, the later path wins.
+    """
+    paths = expand_paths(patterns)
+    if not paths:
+        raise ValueError("No workbooks matched")
+    jobs = [(path, sheet) for path in paths for sheet in sheets_of(path)]
+
+    workers = workers or os.cpu_count()
+    if workers <= 1 or len(jobs) == 1:
+        frames = [read_sheet(path, sheet) for path, sheet in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            frames = list(pool.map(read_sheet, *zip(*jobs)))
+
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(subset=KEYS + ["Year"], keep="last")
+    return df.sort_values(["Date", "Store"], kind="stable", ignore_index=True)
+
+
+# -----------------------------
+# DATASET
+# -----------------------------
+def write_dataset(df, path):
+    """Write rows as Parquet partitioned by month ("Month=2024-12"), replacing those months"""
+    df = df.assign(Month=df["Date"].dt.strftime("%Y-%m"))
+    pq.write_to_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        path,
+        partition_cols=["Month"],
+        existing_data_behavior="delete_matching"
+    )
+
+
+def read_dataset(path, grain="Day", sheets=None):
+    """Rows of one Grain from a dataset written by ``write_dataset``, optionally only some sheets"""
+    filters = [("Grain", "==", grain)]
+    if sheets is not None:
+        filters.append(("Sheet", "in", list(sheets)))
+    df = pd.read_parquet(path, filters=filters)
+    df = df.drop(columns="Month")
+    df["Date"] = pd.to_datetime(df["Date"])
+    return df.sort_values(["Date", "Store"], kind="stable", ignore_index=True)
+
+
+def dataset_key(path):
+    """Key that changes whenever a file in the dataset is added, removed or rewritten"""
+    digest = hashlib.blake2b(digest_size=16)
+    for root, _, files in sorted(os.walk(path)):
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            digest.update(f"{os.path.relpath(os.path.join(root, name), path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def wide(df, last_year, current_year, sheet=LFL_SHEET):
+    """Daily rows of one sheet back in the workbook layout: Site, CY Date and LY/CY columns"""
+    df = df[(df["Sheet"] == sheet) & df["Year"].isin([last_year, current_year])]
+    cy_dates = _in_year(df["Date"], current_year)
+    table = df.assign(Date=cy_dates).pivot_table(
+        index=["Store", "Date"],
+        columns="Year",
+        values=["Units_Sold", "Sales"],
+        aggfunc="sum"
+    )
+    out = pd.DataFrame(index=table.index)
+    for year in (last_year, current_year):
+        for measure, label in (("Units_Sold", "Qty"), ("Sales", "Amount")):
+            out[f"Net Sale {label} - {year}"] = table[(measure, year)] if (measure, year) in table.columns else 0.0
+    return out.fillna(0).reset_index().rename(columns={"Store": "Site"})
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Harmonize LY/CY workbooks into one date-partitioned dataset")
+    parser.add_argument("paths", nargs="+", help="Workbooks, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="sales_dataset",
+                        help="Dataset directory (default: sales_dataset)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    try:
+        df = load(args.paths, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    if not len(df):
+        print("No LY/CY rows found", file=sys.stderr)
+        return 1
+    write_dataset(df, args.output)
+    print(f"Wrote {len(df):,} rows from {df['Source'].nunique()} workbook(s) to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())